@@ -0,0 +1,161 @@
+# Biosphere 2 Semantic Answer Cache
+# Reuses Claude answers for near-identical questions about the same data
+
+import re
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from point_names import question_measurements, question_zones
+from question_time import question_dates
+
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?")
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Any fixed year: both questions' dates are read the same way
+_SIGNATURE_YEAR = 2000
+
+
+def question_signature(question: str) -> tuple:
+    """
+    The entities of a question that an equivalent question must repeat
+
+    Sentence embeddings score questions that differ only in a date, a number
+    or a point name ('humidity on Sept 25' and 'on Sept 26', 'AHUR5' and
+    'AHUR6', 'above 80' and 'above 85') as near-identical. Two questions
+    only share a cached answer if their signatures are equal.
+
+    Returns:
+        (dates, numbers, words with digits, measurements, zones)
+    """
+    text = question.lower()
+    dates = tuple(sorted({(start.isoformat(), end.isoformat())
+                          for start, end in question_dates(text, _SIGNATURE_YEAR)}))
+    numbers = tuple(sorted({repr(float(number)) for number in _NUMBER.findall(text)}))
+    codes = tuple(sorted({word for word in _WORD.findall(text)
+                          if any(c.isdigit() for c in word) and not word.isdigit()}))
+    return dates, numbers, codes, tuple(question_measurements(text)), tuple(question_zones(text))
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of answers keyed on question embeddings
+
+    A lookup hits when a cached question's embedding has cosine similarity
+    of at least `threshold` with the new question and, when the question
+    text is given, the same question_signature. Entries are scoped to a
+    data version (the RAG index data hash): when the version changes, all
+    entries are dropped so answers never outlive the data they came from.
+
+    Embeddings are kept in one preallocated matrix, so a lookup is a single
+    matrix-vector product over the cached questions.
+    """
+
+    def __init__(self, max_size: int = 512, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None
+        self._entries = OrderedDict()  # slot -> entry, least recently used first
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        """Flatten an embedding to a float32 unit vector"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_version(self, data_version: Optional[str]):
+        """Drop every entry if the data version changed (caller holds the lock)"""
+        if data_version != self.data_version:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_size - 1, -1, -1))
+            self.data_version = data_version
+
+    def get(self, embedding: np.ndarray, data_version: Optional[str],
+            question: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically equivalent question
+
+        Args:
+            embedding: Query embedding of the new question
+            data_version: Version of the data the answer must come from
+            question: Question text; if given, a cached answer must also
+                have the same dates, numbers, point names, measurements
+                and zones (see question_signature)
+
+        Returns:
+            Dict with 'question', 'answer', 'sources', 'signature' and
+            'similarity', or None on a miss
+        """
+        vector = self._unit(embedding)
+        with self._lock:
+            self._check_version(data_version)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+            scores = self._vectors[slots] @ vector
+            signature = question_signature(question) if question is not None else None
+            for best in np.argsort(-scores, kind="stable"):
+                if scores[best] < self.threshold:
+                    break
+                slot = int(slots[best])
+                entry = self._entries[slot]
+                if signature is not None and entry['signature'] != signature:
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return {**entry, 'similarity': float(scores[best])}
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding: np.ndarray, data_version: Optional[str], question: str,
+            answer: str, sources: List[Dict[str, Any]]):
+        """
+        Store an answer, evicting the least recently used entry if full
+
+        Args:
+            embedding: Query embedding of the answered question
+            data_version: Version of the data the answer came from
+            question: Original question text
+            answer: Answer text
+            sources: Sources returned with the answer
+        """
+        if self.max_size <= 0:
+            return
+
+        vector = self._unit(embedding)
+        with self._lock:
+            self._check_version(data_version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+
+            if not self._free_slots:
+                evicted_slot, _ = self._entries.popitem(last=False)
+                self._free_slots.append(evicted_slot)
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = {'question': question, 'answer': answer, 'sources': sources,
+                                   'signature': question_signature(question)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'threshold': self.threshold
+            }
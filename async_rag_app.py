@@ -0,0 +1,248 @@
+# Async Biosphere 2 RAG Web App
+# ASGI (FastAPI) serving path for the spectacular RAG interface
+#
+# Run with:  uvicorn async_rag_app:app --host 0.0.0.0 --port 5000
+#
+# The Flask app ties up a worker thread for every in-flight Claude call. Here
+# Claude is called with the async Anthropic client, so one process can keep
+# hundreds of questions waiting on the LLM. Encoding, FAISS search and SQLite
+# work is CPU-bound and runs in a bounded thread pool.
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from anthropic import AsyncAnthropic
+from llm_gateway import AsyncLLMGateway
+from single_flight import AsyncSingleFlight, question_key
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+
+# Shares templates, retrieval helpers, caches and loaded state with the Flask app
+import spectacular_rag_web_app as web
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load sensor data and the RAG index in the background; stop the retrieval pool on exit"""
+    print(f"[INFO] Async RAG app starting ({RAG_THREADS} retrieval threads)")
+    # No-op when gunicorn already preloaded everything (see gunicorn.conf.py)
+    web.start_background_loading()
+    yield
+    rag_executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Biosphere 2 RAG (async)", lifespan=lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+async_claude_client = AsyncAnthropic(api_key=web.api_key) if web.api_key else None
+# Same limits as the Flask gateway, and the same circuit breaker
+async_claude_gateway = AsyncLLMGateway(async_claude_client, breaker=web.claude_breaker,
+                                       **web.LLM_GATEWAY_SETTINGS) if async_claude_client else None
+
+# Concurrent /api/ask requests for the same question and data share one answer
+answer_flights = AsyncSingleFlight()
+
+# Retrieval threads; encoding releases the GIL, so a few threads use the CPUs
+RAG_THREADS = int(os.getenv('RAG_THREADS', str(min(4, os.cpu_count() or 1))))
+rag_executor = ThreadPoolExecutor(max_workers=RAG_THREADS, thread_name_prefix="rag")
+
+
+class QuestionRequest(BaseModel):
+    question: str = ''
+
+
+def prepare_answer(question):
+    """
+    Encode the question, check the answer cache and run retrieval
+
+    This is the CPU and SQLite part of a request and runs in rag_executor.
+
+    Returns:
+        (query_embedding, cached, retrieval) where cached is a cache hit or
+        None and retrieval is retrieve_context's result (None on a hit)
+    """
+    query_embedding = web.rag_database.encode_query(question)
+    cached = web.answer_cache.get(query_embedding, web.rag_database.data_hash, question)
+    if cached:
+        return query_embedding, cached, None
+    return query_embedding, None, web.retrieve_context(question, query_embedding)
+
+
+async def run_in_pool(func, *args):
+    """Run a blocking function in the bounded retrieval thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(rag_executor, func, *args)
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    """Main page"""
+    return web.HTML_TEMPLATE
+
+
+@app.get("/api/system-status")
+async def get_system_status():
+    """Get system status"""
+    return {
+        'data_loaded': web.data_loaded,
+        'rag_ready': web.rag_ready,
+        'sensor_count': len(web.sensor_data) if web.sensor_data else 0
+    }
+
+
+@app.get("/api/rag-stats")
+async def get_rag_stats():
+    """Get RAG database statistics"""
+    stats = await run_in_pool(web.collect_rag_stats)
+    # This process's gateway and flights, not the Flask app's
+    if 'answer_cache' in stats:
+        if async_claude_gateway:
+            stats['llm_gateway'] = async_claude_gateway.stats()
+        stats['single_flight'] = answer_flights.stats()
+    return stats
+
+
+async def compute_answer(question):
+    """
+    Answer a question with RAG and Claude (the work behind /api/ask)
+
+    Returns:
+        Response dict with 'answer', 'sources' and, for answer cache hits, 'cached'
+    """
+    query_embedding, cached, retrieval = await run_in_pool(prepare_answer, question)
+    if cached:
+        return {'answer': cached['answer'], 'sources': cached['sources'], 'cached': True}
+
+    search_results, sources, rag_context = retrieval
+    sources = sources[:3]
+
+    if rag_context is None:
+        return {'answer': web.NO_RESULTS_ANSWER, 'sources': sources}
+
+    if not async_claude_client:
+        return {'answer': web.MISSING_API_KEY_ANSWER, 'sources': sources}
+
+    try:
+        response = await async_claude_gateway.create(**web.build_answer_request(question, rag_context))
+        web.prompt_cache_stats.record(response.usage, label="/api/ask")
+        answer = response.content[0].text
+        web.answer_cache.put(query_embedding, web.rag_database.data_hash, question, answer, sources)
+    except Exception as e:
+        print(f"[ERROR] Claude API call failed: {e}")
+        answer = web.fallback_answer(search_results, e)
+
+    return {'answer': answer, 'sources': sources}
+
+
+@app.post("/api/ask")
+async def ask_question(payload: QuestionRequest):
+    """Ask a question using RAG system"""
+    question = payload.question
+    try:
+        if not question:
+            return {'answer': 'Please provide a question.', 'sources': []}
+
+        if not web.rag_ready or not web.rag_database:
+            return {'answer': web.RAG_INITIALIZING_ANSWER, 'sources': []}
+
+        # Identical questions arriving together share one retrieval and Claude call
+        key = question_key(question, web.rag_database.data_hash)
+        return await answer_flights.do(key, lambda: compute_answer(question))
+
+    except Exception as e:
+        print(f"[ERROR] Question processing failed: {e}")
+        return {
+            'answer': 'Sorry, I encountered an error processing your question. Please try again.',
+            'sources': []
+        }
+
+
+@app.post("/api/ask/stream")
+async def ask_question_stream(payload: QuestionRequest):
+    """
+    Ask a question using RAG system, streaming the answer as server-sent events
+
+    Same event protocol as the Flask endpoint: 'sources', 'token'..., then
+    'done' (or 'error').
+    """
+    question = payload.question
+
+    def whole_answer(answer, sources, cached=False):
+        """Events for an answer that is already complete"""
+        return [
+            web.sse_event('sources', {'sources': sources, 'cached': cached}),
+            web.sse_event('token', {'text': answer}),
+            web.sse_event('done', {'answer': answer})
+        ]
+
+    async def generate():
+        try:
+            if not question:
+                for event in whole_answer('Please provide a question.', []):
+                    yield event
+                return
+
+            if not web.rag_ready or not web.rag_database:
+                for event in whole_answer(web.RAG_INITIALIZING_ANSWER, []):
+                    yield event
+                return
+
+            query_embedding, cached, retrieval = await run_in_pool(prepare_answer, question)
+            if cached:
+                for event in whole_answer(cached['answer'], cached['sources'], cached=True):
+                    yield event
+                return
+
+            search_results, sources, rag_context = retrieval
+            sources = sources[:3]
+
+            if rag_context is None or not async_claude_client:
+                answer = web.NO_RESULTS_ANSWER if rag_context is None else web.MISSING_API_KEY_ANSWER
+                for event in whole_answer(answer, sources):
+                    yield event
+                return
+
+            # Sources go out before the LLM call so the client can render them immediately
+            yield web.sse_event('sources', {'sources': sources, 'cached': False})
+
+            parts = []
+            try:
+                async with async_claude_gateway.stream(**web.build_answer_request(question, rag_context)) as stream:
+                    async for text in stream.text_stream:
+                        parts.append(text)
+                        yield web.sse_event('token', {'text': text})
+                    web.prompt_cache_stats.record((await stream.get_final_message()).usage, label="/api/ask/stream")
+            except Exception as e:
+                print(f"[ERROR] Claude API streaming failed: {e}")
+                if parts:
+                    yield web.sse_event('error', {'message': 'The answer was interrupted. Please try again.'})
+                    return
+                answer = web.fallback_answer(search_results, e)
+                yield web.sse_event('token', {'text': answer})
+                yield web.sse_event('done', {'answer': answer})
+                return
+
+            answer = "".join(parts)
+            web.answer_cache.put(query_embedding, web.rag_database.data_hash, question, answer, sources)
+            yield web.sse_event('done', {'answer': answer})
+
+        except Exception as e:
+            print(f"[ERROR] Streaming question processing failed: {e}")
+            yield web.sse_event('error', {
+                'message': 'Sorry, I encountered an error processing your question. Please try again.'
+            })
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+    })
+
+
+if __name__ == "__main__":
+    import uvicorn
+    print("Starting async Biosphere 2 RAG web interface...")
+    print("Web interface will be available at: http://localhost:5000")
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,87 @@
+# Biosphere 2 CSV Loader Benchmark
+# Compares the typed C-engine trend reader with the generic python-engine parser
+#
+# Only parsing is timed: read_trend_csv is called directly, so neither the
+# Arrow cache (trend_cache) nor the stats and rollups of load_sensor_file are
+# part of the measurement.
+
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+from contextlib import redirect_stdout
+
+from simple_interface import read_csv_generic
+from trend_reader import read_trend_csv
+
+
+def time_loader(loader, csv_files, repeats):
+    """Return per-repeat wall times (seconds) for loading every file once"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        # Silence the per-file fallback/warning prints so they don't skew timings
+        with redirect_stdout(io.StringIO()):
+            for file_path in csv_files:
+                try:
+                    loader(file_path)
+                except Exception:
+                    pass
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def compare_outputs(csv_files):
+    """Count files whose parsed row counts differ between the two parsers"""
+    differences = []
+    with redirect_stdout(io.StringIO()):
+        for file_path in csv_files:
+            try:
+                fast = len(read_trend_csv(file_path))
+                generic = len(read_csv_generic(file_path))
+            except Exception as e:
+                differences.append((os.path.basename(file_path), f"error: {e}"))
+                continue
+            if fast != generic:
+                differences.append((os.path.basename(file_path), f"readings {generic} -> {fast}"))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sensor CSV parsers")
+    parser.add_argument("--data-dir", default="data", help="Directory with trend CSV exports")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed passes per loader")
+    args = parser.parse_args()
+
+    csv_files = sorted(glob.glob(os.path.join(args.data_dir, "*.csv")))
+    if not csv_files:
+        print(f"[WARNING] No CSV files found in {args.data_dir}")
+        return
+
+    total_mb = sum(os.path.getsize(f) for f in csv_files) / (1024 * 1024)
+    print(f"[INFO] Benchmarking {len(csv_files)} files ({total_mb:.1f} MB), {args.repeats} repeats")
+
+    results = {}
+    for name, loader in [("generic (python engine)", read_csv_generic),
+                         ("typed trend reader (C engine)", read_trend_csv)]:
+        timings = time_loader(loader, csv_files, args.repeats)
+        results[name] = statistics.median(timings)
+        print(f"  {name:32s} median {results[name] * 1000:8.1f} ms   "
+              f"best {min(timings) * 1000:8.1f} ms   "
+              f"({len(csv_files) / results[name]:.0f} files/s)")
+
+    generic_time, fast_time = results.values()
+    print(f"\n[RESULT] Speedup: {generic_time / fast_time:.1f}x")
+
+    differences = compare_outputs(csv_files)
+    if differences:
+        print(f"\n[INFO] {len(differences)} files differ in row count "
+              "(the generic loader drops rows whose STATUS_TAG contains commas):")
+        for filename, detail in differences:
+            print(f"  - {filename}: {detail}")
+
+
+if __name__ == "__main__":
+    main()
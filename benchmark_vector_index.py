@@ -0,0 +1,127 @@
+# Biosphere 2 Vector Index Benchmark
+# Build time, index size, query latency and recall of the flat, HNSW and IVF-PQ backends
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vector_backends import (INDEX_BACKENDS, create_index, exact_rerank, rerank_factor, resolve_params,
+                             search_parameters)
+
+# Query-time knob swept for each backend (see vector_backends.BACKEND_PARAMS);
+# IVF-PQ recall barely moves with nprobe, the exact re-rank depth decides it
+KNOBS = {
+    "flat": ("none", [None]),
+    "hnsw": ("ef_search", [16, 64, 256]),
+    "ivfpq": ("k_factor", [1, 4, 10, 20])
+}
+
+
+def cluster_centres(clusters, dimension, seed=0):
+    """Random centres for synthetic_chunks"""
+    return np.random.default_rng(seed).standard_normal((clusters, dimension), dtype=np.float32)
+
+
+def synthetic_chunks(n, centres, seed=0):
+    """
+    Unit vectors drawn around the given cluster centres
+
+    Sentence embeddings of sensor chunks are far from uniform (one cluster
+    per sensor and chunk type), so clustered data gives ANN indexes a more
+    realistic workload than isotropic noise. Queries are drawn around the
+    same centres with another seed, i.e. held out from the corpus
+    distribution, like real questions about the indexed sensors.
+    """
+    rng = np.random.default_rng(seed)
+    clusters, dimension = centres.shape
+    vectors = np.empty((n, dimension), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        stop = min(start + 100_000, n)
+        labels = rng.integers(0, clusters, stop - start)
+        vectors[start:stop] = centres[labels] + 0.5 * rng.standard_normal((stop - start, dimension), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def query_latencies(index, queries, k, params, vectors=None, k_factor=1):
+    """
+    Per-query search times in ms (one query per call, as the web app searches)
+
+    With k_factor > 1 the top k * k_factor hits are re-ranked exactly against
+    vectors, as Biosphere2RAGDatabase.search does with the stored embeddings
+    (the SQLite read it adds is not timed here).
+    """
+    latencies = np.empty(len(queries))
+    results = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k * k_factor, params=params)
+        ids = ids[0][ids[0] >= 0]
+        if k_factor > 1:
+            _, ids = exact_rerank(query, ids, vectors[ids], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        results[i, :len(ids[:k])] = ids[:k]
+    return latencies, results
+
+
+def recall_at_k(results, truth):
+    """Share of the exact top-k found by the approximate search"""
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index backends on synthetic chunks")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="Comma-separated corpus sizes (1M chunks needs about 4 GB of RAM)")
+    parser.add_argument("--backends", default=",".join(INDEX_BACKENDS), help="Comma-separated backends")
+    parser.add_argument("--dimension", type=int, default=384, help="Embedding dimension (MiniLM: 384)")
+    parser.add_argument("--queries", type=int, default=500, help="Timed queries per setting")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    args = parser.parse_args()
+
+    backends = [b for b in INDEX_BACKENDS if b in args.backends.split(",")]
+    print(f"[INFO] FAISS {faiss.__version__}, {faiss.omp_get_max_threads()} threads, "
+          f"dimension {args.dimension}, {args.queries} queries, k={args.k}")
+
+    for n in [int(size) for size in args.sizes.split(",")]:
+        centres = cluster_centres(max(10, n // 500), args.dimension)
+        vectors = synthetic_chunks(n, centres)
+        ids = np.arange(n, dtype=np.int64)
+        queries = synthetic_chunks(args.queries, centres, seed=1)
+        # Exact neighbours, for recall
+        truth = faiss.knn(queries, vectors, args.k, metric=faiss.METRIC_INNER_PRODUCT)[1]
+
+        print(f"\n[RESULT] {n:,} chunks")
+        print(f"  {'backend':8s} {'build s':>8s} {'index MB':>9s} "
+              f"{'knob':>14s} {'p50 ms':>8s} {'p99 ms':>8s} {'recall@k':>9s}")
+        for backend in backends:
+            params = resolve_params(backend)
+            start = time.perf_counter()
+            try:
+                index = create_index(backend, vectors, ids, params)
+            except ValueError as e:
+                print(f"  {backend:8s} skipped: {e}")
+                continue
+            build_seconds = time.perf_counter() - start
+            index_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+            knob_name, knob_values = KNOBS[backend]
+            for value in knob_values:
+                if value is not None:
+                    params[knob_name] = value
+                latencies, results = query_latencies(index, queries, args.k,
+                                                     search_parameters(backend, params),
+                                                     vectors, rerank_factor(backend, params))
+                knob = f"{knob_name}={value}" if value is not None else "exact"
+                print(f"  {backend:8s} {build_seconds:8.2f} {index_mb:9.1f} {knob:>14s} "
+                      f"{np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 99):8.3f} "
+                      f"{recall_at_k(results, truth):9.3f}")
+            del index
+
+        del vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Biosphere 2 Context Builder
+# Packs retrieved chunks into a token budget for the answer prompt
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from point_names import describe_quantity, short_sensor_name, strip_export_id
+
+# Claude tokenizes English text and numbers at roughly 3.5-4 characters per token
+CHARS_PER_TOKEN = 4
+
+# Chunks sharing at least this share of their words with a better-ranked
+# chunk are dropped (e.g. the same point exported under two ids)
+DUPLICATE_THRESHOLD = 0.85
+
+_WORD = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+
+def compact_text(text: str) -> str:
+    """Strip indentation and blank lines and collapse runs of spaces"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Claude token count of text (no tokenizer call)"""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _overlap(words: set, other: set) -> float:
+    """Jaccard similarity of two word sets"""
+    return len(words & other) / len(words | other) if words or other else 1.0
+
+
+def select_chunks(search_results: List[Dict[str, Any]], max_tokens: int,
+                  duplicate_threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Choose which search results go into the prompt
+
+    Results are compacted, near-duplicates of better-ranked results are
+    dropped, and the rest are packed greedily by score per token (the
+    classic knapsack heuristic) until the budget is full.
+
+    Args:
+        search_results: Results from Biosphere2RAGDatabase.search, best first
+        max_tokens: Token budget for the context
+        duplicate_threshold: Word overlap above which a chunk is a duplicate
+
+    Returns:
+        Selected chunks, in search rank order, as dicts with 'text',
+        'tokens', 'score' and the original 'result'
+    """
+    candidates = []
+    for rank, result in enumerate(search_results):
+        text = f"[{result['metadata'].get('sensor_type', 'unknown')}] {compact_text(result['content'])}"
+        words = set(_WORD.findall(text.lower()))
+        if any(_overlap(words, kept['words']) >= duplicate_threshold for kept in candidates):
+            continue
+
+        # Fused rank score from hybrid search, else cosine similarity; a small
+        # rank-based score keeps unscored or negative hits in rank order
+        score = result.get('fusion_score', result.get('similarity_score'))
+        if score is None or score <= 0:
+            score = 1e-3 / (rank + 1)
+        candidates.append({'rank': rank, 'text': text, 'words': words,
+                           'tokens': estimate_tokens(text), 'score': score, 'result': result})
+
+    selected, used = [], 0
+    for candidate in sorted(candidates, key=lambda c: c['score'] / c['tokens'], reverse=True):
+        if used + candidate['tokens'] <= max_tokens:
+            selected.append(candidate)
+            used += candidate['tokens']
+
+    return [{key: c[key] for key in ('text', 'tokens', 'score', 'result')}
+            for c in sorted(selected, key=lambda c: c['rank'])]
+
+
+def format_number(value: Optional[float]) -> str:
+    """Round for the prompt: 4 significant digits, integers without '.0'"""
+    if value is None:
+        return ""
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.4g}" if abs(value) < 1e4 else f"{value:.0f}"
+
+
+def format_table(title: str, columns: Sequence[str], rows: List[Sequence[str]]) -> str:
+    """
+    Pipe-separated table with one header line; columns empty in every row are left out
+
+    Returns:
+        '<title>:\n<header>\n<row>...' or '' if there are no rows
+    """
+    keep = [i for i in range(len(columns)) if any(row[i] != "" for row in rows)]
+    if not keep:
+        return ""
+    lines = [f"{title}:", " | ".join(columns[i] for i in keep)]
+    lines.extend(" | ".join(row[i] for i in keep) for row in rows)
+    return "\n".join(lines)
+
+
+# Tables of the compact context: title and columns, per table
+SENSOR_COLUMNS = ("sensor", "quantity", "readings", "from", "to", "min", "max", "mean",
+                  "median", "p5", "p95", "std", "time-weighted mean", "% time on", "on/off changes")
+ROLLUP_COLUMNS = ("sensor", "quantity", "period", "start", "readings", "min", "max", "mean")
+SAMPLE_COLUMNS = ("sensor", "time", "value", "status")
+TABLES = {
+    "sensors": ("Sensor statistics", SENSOR_COLUMNS),
+    "rollups": ("Hourly/daily rollups", ROLLUP_COLUMNS),
+    "samples": ("Sample readings", SAMPLE_COLUMNS)
+}
+
+
+def _sensor_row(chunks: List[Dict[str, Any]]) -> List[str]:
+    """One sensors-table row from a sensor's summary and/or statistics chunks"""
+    metadata = {}
+    for chunk in chunks:
+        metadata.update(chunk['metadata'])
+    stats = metadata.get('value_stats') or {
+        'min': metadata.get('min_value'), 'max': metadata.get('max_value'), 'mean': metadata.get('mean_value')
+    }
+    start, _, end = str(metadata.get('time_range', '')).partition(' to ')
+    duty_cycle = stats.get('duty_cycle')
+    return [
+        short_sensor_name(metadata.get('sensor_type', 'unknown')),
+        describe_quantity(metadata.get('description', '')) if 'description' in metadata else "",
+        format_number(metadata.get('total_readings')) if 'total_readings' in metadata else "",
+        start[:16] if end else "", end[:16],
+        *(format_number(stats.get(key)) for key in ('min', 'max', 'mean', 'p50', 'p5', 'p95', 'std',
+                                                    'time_weighted_mean')),
+        format_number(duty_cycle * 100) if duty_cycle is not None else "",
+        format_number(stats.get('transitions'))
+    ]
+
+
+def _table_units(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group search results into table rows (or compact text for other chunks)
+
+    A sensor's summary and statistics chunks share one row, ranked at the
+    better of the two.
+    """
+    units, sensor_units = [], {}
+    for rank, result in enumerate(search_results):
+        metadata = result['metadata']
+        chunk_type = metadata.get('chunk_type')
+        sensor = short_sensor_name(metadata.get('sensor_type', 'unknown'))
+        score = result.get('fusion_score', result.get('similarity_score'))
+        if score is None or score <= 0:
+            score = 1e-3 / (rank + 1)
+        
+        if chunk_type in ('summary', 'statistics'):
+            unit = sensor_units.get(sensor)
+            if unit is None:
+                unit = sensor_units[sensor] = {'rank': rank, 'table': 'sensors', 'chunks': [], 'score': score}
+                units.append(unit)
+            unit['chunks'].append(result)
+            unit['score'] = max(unit['score'], score)
+            continue
+        
+        if chunk_type == 'rollup':
+            row = [sensor, describe_quantity(metadata.get('description', '')) if 'description' in metadata else "",
+                   metadata.get('period', ''), str(metadata.get('start_time', ''))[:16],
+                   format_number(metadata.get('count')), format_number(metadata.get('min_value')),
+                   format_number(metadata.get('max_value')), format_number(metadata.get('mean_value'))]
+            units.append({'rank': rank, 'table': 'rollups', 'row': row, 'score': score})
+        elif chunk_type == 'sample_data':
+            value = metadata.get('value')
+            row = [sensor, str(metadata.get('timestamp', ''))[:19],
+                   format_number(value) if isinstance(value, (int, float)) else str(value or ""),
+                   str(metadata.get('status') or "").strip("{} ")]
+            units.append({'rank': rank, 'table': 'samples', 'row': row, 'score': score})
+        else:
+            units.append({'rank': rank, 'table': None, 'score': score,
+                          'text': f"[{sensor}] {compact_text(result['content'])}"})
+
+    for unit in units:
+        if unit['table'] == 'sensors':
+            unit['row'] = _sensor_row(unit['chunks'])
+        unit['tokens'] = estimate_tokens(unit['text'] if unit['table'] is None else " | ".join(unit['row']))
+    return units
+
+
+def build_table_context(search_results: List[Dict[str, Any]], max_tokens: int) -> str:
+    """
+    Compact context: retrieved chunks as rows of shared-header tables
+
+    Sensor summaries and statistics become one row per sensor, rollups and
+    sample readings one row each, with rounded numbers. Rows are packed into
+    the budget like select_chunks does; a table's header is charged to its
+    first row. Chunks of other types are kept as compact text.
+
+    Args:
+        search_results: Results from Biosphere2RAGDatabase.search, best first
+        max_tokens: Token budget for the context
+
+    Returns:
+        Context string
+    """
+    header_tokens = {name: estimate_tokens(f"{title}:\n" + " | ".join(columns))
+                     for name, (title, columns) in TABLES.items()}
+
+    # Rows equal but for the export id are the same point exported twice; keep the better-ranked one
+    units, seen = [], set()
+    for unit in _table_units(search_results):
+        if unit['table'] is None:
+            key = (None, unit['text'])
+        else:
+            key = (unit['table'], strip_export_id(unit['row'][0]), *unit['row'][1:])
+        if key not in seen:
+            seen.add(key)
+            units.append(unit)
+
+    selected, used, started = [], 0, set()
+    for unit in sorted(units, key=lambda u: u['score'] / u['tokens'], reverse=True):
+        cost = unit['tokens']
+        if unit['table'] is not None and unit['table'] not in started:
+            cost += header_tokens[unit['table']]
+        if used + cost <= max_tokens:
+            selected.append(unit)
+            used += cost
+            started.add(unit['table'])
+    selected.sort(key=lambda u: u['rank'])
+
+    parts = [unit['text'] for unit in selected if unit['table'] is None]
+    for name, (title, columns) in TABLES.items():
+        table = format_table(title, columns, [unit['row'] for unit in selected if unit['table'] == name])
+        if table:
+            parts.append(table)
+    return "\n\n".join(parts)
+
+
+def build_context(search_results: List[Dict[str, Any]], max_tokens: int, compact: bool = False) -> str:
+    """
+    Context string for the answer prompt within a token budget
+
+    Args:
+        search_results: Results from Biosphere2RAGDatabase.search, best first
+        max_tokens: Token budget for the context
+        compact: Encode chunks as tables (build_table_context) instead of text
+
+    Returns:
+        Selected chunks separated by blank lines
+    """
+    if compact:
+        return build_table_context(search_results, max_tokens)
+    return "\n\n".join(chunk['text'] for chunk in select_chunks(search_results, max_tokens))
@@ -0,0 +1,151 @@
+# Biosphere 2 Retrieval Quality Harness
+# Measures recall@k of RAG search on labelled questions
+
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from rag_database import Biosphere2RAGDatabase, compute_data_hash
+from simple_interface import load_all_sensor_data, sensor_source_hashes
+
+# Questions from test_questions.py, your_crisp_questions.py and crisp_test.py,
+# plus point-name questions. A hit is relevant if it matches the filters
+# (see Biosphere2RAGDatabase.filter_ids).
+RETRIEVAL_QUESTIONS = [
+    ("What was the temperature trend over the monitoring period?", {"measurement": "temperature"}),
+    ("How many temperature readings were recorded?",
+     {"measurement": "temperature", "chunk_type": ["summary", "statistics"]}),
+    ("What is the temperature range in the Biosphere 2 rainforest area?", {"measurement": "temperature"}),
+    ("Was there super heat on any particular day?", {"measurement": "temperature"}),
+    ("On which day there was a sudden raise or increase and drop or decrease in the temperature "
+     "and let me know if that affected the moisture level of the soil?",
+     {"measurement": ["temperature", "humidity"]}),
+    ("What's the temperature range?", {"measurement": "temperature"}),
+    ("How many readings were recorded?", {"chunk_type": ["overview", "summary"]}),
+    ("What's the fan status?", {"measurement": "fan"}),
+    ("What's the highest temperature?", {"measurement": "temperature"}),
+    ("How many sensors are working?", {"chunk_type": "overview"}),
+    ("What is the humidity in the lowland?", {"measurement": "humidity", "zone": "lowland"}),
+    ("How humid is the mountain?", {"measurement": "humidity", "zone": "mountain"}),
+    ("What are the CO2 levels?", {"measurement": "co2"}),
+    ("Show me LOWLNDHUM", {"measurement": "humidity", "zone": "lowland"}),
+    ("What is the AHU supply air temperature SATMP?", {"sensor_type": "uab2_bio1_b4000_ahur5_satmp_930583"}),
+    ("What does RFTESCOVFDOUT report?", {"equipment": "miscsav1", "measurement": "fan"}),
+    ("Is any valve open?", {"measurement": "valve"}),
+    ("Were there any alarms?", {"measurement": "alarm"}),
+    # General questions must not be swamped by the far more numerous hourly/daily
+    # rollups; questions naming a day should still reach them
+    ("What is the humidity in the lowland?",
+     {"measurement": "humidity", "zone": "lowland", "chunk_type": ["summary", "statistics"]}),
+    ("Show me LOWLNDHUM", {"measurement": "humidity", "zone": "lowland", "chunk_type": ["summary", "statistics"]}),
+    ("What is the mountain temperature?",
+     {"measurement": "temperature", "zone": "mountain", "chunk_type": ["summary", "statistics"]}),
+    ("What was the lowland humidity on October 5?",
+     {"measurement": "humidity", "zone": "lowland", "chunk_type": "rollup"})
+]
+
+K_VALUES = (1, 5, 10)
+
+
+def rank_of_first_relevant(ranked_ids, relevant_ids):
+    """1-based rank of the first relevant id, or None"""
+    for rank, row_id in enumerate(ranked_ids, start=1):
+        if row_id in relevant_ids:
+            return rank
+    return None
+
+
+def summarize(ranks, k_values=K_VALUES):
+    """recall@k (share of questions with a relevant hit in the top k) and MRR"""
+    summary = {f"recall@{k}": float(np.mean([r is not None and r <= k for r in ranks])) for k in k_values}
+    summary["mrr"] = float(np.mean([1.0 / r if r else 0.0 for r in ranks]))
+    return summary
+
+
+def print_summary(name, summary):
+    print(f"  {name:28s} " + "   ".join(f"{key} {value:.2f}" for key, value in summary.items()))
+
+
+def evaluate_search(rag_db, questions, hybrid, k=max(K_VALUES)):
+    """First-relevant ranks of rag_db.search for each question"""
+    row_ids = {document['doc_id']: row_id for row_id, document in rag_db.doc_store.items()}
+    ranks = []
+    for question, filters in questions:
+        relevant_ids = set(rag_db.filter_ids(filters).tolist())
+        results = rag_db.search(question, top_k=k, hybrid=hybrid)
+        ranks.append(rank_of_first_relevant([row_ids[r['doc_id']] for r in results], relevant_ids))
+    return ranks
+
+
+def evaluate_normalization(rag_db, questions, k=max(K_VALUES)):
+    """
+    Re-encode every chunk and rank by raw inner product versus cosine
+
+    Shows what unnormalized vectors (INDEX_FORMAT_VERSION 1) did to
+    vector-only retrieval, on the same chunks and questions.
+    """
+    row_ids = np.fromiter(rag_db.doc_store.keys(), dtype=np.int64)
+    texts = [rag_db.doc_store[row_id]['content'] for row_id in row_ids]
+    print(f"[INFO] Re-encoding {len(texts)} chunks without normalization...")
+    start = time.perf_counter()
+    raw = np.asarray(rag_db.embedding_model.encode(texts, batch_size=64, show_progress_bar=False,
+                                                   convert_to_numpy=True), dtype=np.float32)
+    print(f"[INFO] Encoded in {time.perf_counter() - start:.1f}s")
+    unit = raw / np.maximum(np.linalg.norm(raw, axis=1, keepdims=True), 1e-12)
+
+    ranks = {"raw inner product": [], "cosine (normalized)": []}
+    for question, filters in questions:
+        relevant_ids = set(rag_db.filter_ids(filters).tolist())
+        query = np.asarray(rag_db.embedding_model.encode([question]), dtype=np.float32)[0]
+        for name, vectors, q in [("raw inner product", raw, query),
+                                 ("cosine (normalized)", unit, query / max(np.linalg.norm(query), 1e-12))]:
+            top = np.argsort(-(vectors @ q), kind="stable")[:k]
+            ranks[name].append(rank_of_first_relevant(row_ids[top].tolist(), relevant_ids))
+    return ranks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RAG retrieval recall@k")
+    parser.add_argument("--db", default="biosphere2_rag.db", help="RAG SQLite database")
+    parser.add_argument("--compare-normalization", action="store_true",
+                        help="Also re-encode all chunks and compare raw inner product with cosine")
+    parser.add_argument("--verbose", action="store_true", help="Print the first relevant rank per question")
+    args = parser.parse_args()
+
+    # Same startup path as the web app: reuse the saved index or sync it
+    with redirect_stdout(io.StringIO()):
+        rag_db = Biosphere2RAGDatabase(db_path=args.db)
+        data_hash = compute_data_hash()
+        with rag_db.sync_lock():
+            if not rag_db.load_vector_index(data_hash):
+                rag_db.load_vector_index()
+                rag_db.sync_documents(load_all_sensor_data(), sensor_source_hashes())
+                rag_db.save_vector_index(data_hash)
+    if rag_db.vector_index is None:
+        print("[ERROR] No vector index available")
+        return
+
+    print(f"[INFO] {len(RETRIEVAL_QUESTIONS)} questions, {rag_db.vector_index.ntotal} indexed chunks")
+    all_ranks = {
+        "vector (cosine)": evaluate_search(rag_db, RETRIEVAL_QUESTIONS, hybrid=False),
+        "hybrid (vector + BM25)": evaluate_search(rag_db, RETRIEVAL_QUESTIONS, hybrid=True)
+    }
+    if args.compare_normalization:
+        all_ranks.update(evaluate_normalization(rag_db, RETRIEVAL_QUESTIONS))
+
+    print("\n[RESULT] Retrieval quality:")
+    for name, ranks in all_ranks.items():
+        print_summary(name, summarize(ranks))
+
+    if args.verbose:
+        print("\nFirst relevant rank per question:")
+        for i, (question, _) in enumerate(RETRIEVAL_QUESTIONS):
+            ranks = "  ".join(f"{ranks[i] or '-':>3}" for ranks in all_ranks.values())
+            print(f"  {ranks}  {question[:70]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Biosphere 2 Gunicorn Configuration
+# Preloads the RAG model and index in the master so workers share their memory
+#
+# Gunicorn reads this file automatically from the working directory, so the
+# existing commands (Dockerfile, Procfile, render.yaml) pick it up unchanged.
+# Set RAG_PRELOAD=0 to load everything separately in each worker instead.
+
+import os
+import sys
+
+preload_app = os.getenv("RAG_PRELOAD", "1") != "0"
+
+# Threaded workers serve several requests at once; a sync worker handles one
+# at a time, so SingleFlight would never see two identical questions in flight.
+# RAG_LLM_CONCURRENCY (LLMGateway.max_in_flight, default 8) caps how many of a
+# worker's threads wait on Claude, leaving the rest for cache hits and search.
+worker_class = "gthread"
+threads = int(os.getenv("RAG_WORKER_THREADS", "16"))
+
+# The tokenizer's thread pool must not be running when the master forks
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+RAG_MODULE = "spectacular_rag_web_app"
+
+
+def process_memory(pid="self"):
+    """
+    Memory of a process in MB from /proc
+
+    Returns:
+        Dict with 'rss' and, where smaps_rollup is available, 'pss',
+        'shared' and 'private' (pages shared with the master count as shared)
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return {"rss": int(line.split()[1]) / 1024}
+        return {}
+
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def format_memory(memory):
+    """One-line summary of process_memory()"""
+    return " ".join(f"{key}={value:.1f}MB" for key, value in memory.items())
+
+
+def when_ready(server):
+    """Master, before forking: load data, model and memory-mapped index once, if an index is saved"""
+    if not preload_app or RAG_MODULE not in sys.modules:
+        return
+
+    server.log.info("[PRELOAD] Loading RAG data, model and index in the master...")
+    sys.modules[RAG_MODULE].preload_rag()
+    server.log.info(f"[MEMORY] master {os.getpid()}: {format_memory(process_memory())}")
+
+
+def post_fork(server, worker):
+    """Worker, right after fork: reopen SQLite instead of using the master's connection"""
+    if preload_app and RAG_MODULE in sys.modules:
+        sys.modules[RAG_MODULE].init_worker()
+
+
+def post_worker_init(worker):
+    """Worker startup probe: start per-worker loading if not preloaded, report memory"""
+    module = sys.modules.get(RAG_MODULE)
+    if module is not None:
+        module.start_background_loading()
+
+    worker.log.info(f"[MEMORY] worker {os.getpid()}: {format_memory(process_memory())}")
@@ -0,0 +1,115 @@
+# Biosphere 2 Lexical Index
+# In-memory BM25 over chunk text and point-name tokens
+
+import re
+import numpy as np
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Question words that would otherwise match stray chunk text
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from had has have how i in is it its me
+of on or show tell that the their there these this to was were what when where
+which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens, without stopwords"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of documents
+
+    Each term's BM25 weight in each document is precomputed at build time,
+    so a query only adds up the posting arrays of its terms. Opaque point
+    names such as LOWLNDHUM or RFTESCOVFDOUT are matched exactly here,
+    where a sentence embedding model represents them poorly.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = np.empty(0, dtype=np.int64)
+        self.postings = {}  # term -> (document positions, BM25 weights)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build(self, documents: Iterable[Tuple[int, str]]):
+        """
+        Index documents
+
+        Args:
+            documents: (id, text) pairs; ids are returned by search
+        """
+        ids, lengths = [], []
+        term_positions, term_counts = {}, {}
+        for position, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            ids.append(doc_id)
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_positions.setdefault(term, []).append(position)
+                term_counts.setdefault(term, []).append(count)
+
+        self.ids = np.array(ids, dtype=np.int64)
+        lengths = np.array(lengths, dtype=np.float32)
+        n_docs = len(ids)
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()) if n_docs else 0.0, 1.0))
+
+        self.postings = {}
+        for term, positions in term_positions.items():
+            positions = np.array(positions, dtype=np.int32)
+            tf = np.array(term_counts[term], dtype=np.float32)
+            idf = np.log1p((n_docs - len(positions) + 0.5) / (len(positions) + 0.5))
+            self.postings[term] = (positions, (idf * tf * (self.k1 + 1) / (tf + norm[positions])).astype(np.float32))
+
+    def search(self, query: str, top_k: int = 10,
+               allowed_ids: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Rank documents for a query
+
+        Args:
+            query: Query text
+            top_k: Number of results
+            allowed_ids: Sorted ids to restrict the search to (None for all)
+
+        Returns:
+            (id, score) pairs, best first; only documents matching a term
+        """
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if not terms or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            positions, weights = self.postings[term]
+            scores[positions] += weights
+
+        if allowed_ids is not None:
+            scores[~np.isin(self.ids, allowed_ids, assume_unique=True)] = 0
+
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > top_k:
+            matches = matches[np.argpartition(-scores[matches], top_k - 1)[:top_k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return [(int(self.ids[position]), float(scores[position])) for position in matches]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> Dict[int, float]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)
+
+    Returns:
+        {id: fused score}, ordered best first
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return dict(sorted(fused.items(), key=lambda item: item[1], reverse=True))
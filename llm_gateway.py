@@ -0,0 +1,397 @@
+# Biosphere 2 LLM Gateway
+# Bounded concurrency, deadlines, jittered retries and a circuit breaker around Claude calls
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+import anthropic
+
+# Rate limited (429) and overloaded (529): worth another try after a pause
+RETRYABLE_STATUS = {429, 529}
+
+BACKOFF_BASE = 0.5  # seconds, doubled per attempt
+BACKOFF_CAP = 8.0
+
+
+class LLMUnavailableError(Exception):
+    """Claude was not called: the breaker is open, no slot freed up or the deadline passed"""
+
+
+def _status(error: Exception) -> Optional[int]:
+    """HTTP status of an Anthropic API error, if it has one"""
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limit and overload errors are retried"""
+    return _status(error) in RETRYABLE_STATUS
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Errors that say Claude is unhealthy and count towards opening the breaker
+
+    Server errors, rate limits, timeouts and connection errors do; client
+    errors such as a bad request or a bad API key do not.
+    """
+    status = _status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # APITimeoutError is an APIConnectionError
+    return isinstance(error, (anthropic.APIConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+def backoff_delay(attempt: int, error: Exception) -> float:
+    """
+    Pause before retry number attempt (0-based)
+
+    Full jitter: uniform in [0, base * 2^attempt], capped, so clients that
+    failed together do not retry together. A Retry-After header is a lower
+    bound.
+    """
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stops calling Claude after repeated upstream failures
+
+    Closed: calls go through. After failure_threshold consecutive failures
+    it opens and every call is refused for reset_timeout seconds. Then it is
+    half-open: one trial call goes through, and closes the breaker if it
+    succeeds or opens it again if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open'"""
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the trial call when half-open)"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        """A call succeeded: close the breaker"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """An upstream failure: open the breaker at the threshold, or again after a failed trial"""
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                print(f"[WARNING] Claude circuit breaker open for {self.reset_timeout:.0f}s "
+                      f"after {self.failures} failures")
+            self.trial_running = False
+
+    def release(self):
+        """A call ended without telling anything about upstream health (e.g. a bad request)"""
+        with self._lock:
+            self.trial_running = False
+
+
+class _GatewayBase:
+    """Settings, breaker and counters shared by the sync and async gateways"""
+
+    def __init__(self, client: Any, max_in_flight: int = 8, timeout: float = 20.0,
+                 max_retries: int = 2, queue_timeout: float = 5.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        # The gateway does the retrying; the SDK's own retries would multiply it
+        self.client = client.with_options(max_retries=0)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.in_flight = 0
+        self.counts = {"calls": 0, "retries": 0, "failures": 0, "rejected_open": 0, "rejected_busy": 0}
+        self._count_lock = threading.Lock()
+
+    def _count(self, name: str, delta: int = 1):
+        with self._count_lock:
+            self.counts[name] += delta
+
+    def _check_breaker(self):
+        """Refuse immediately while the breaker is open"""
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise LLMUnavailableError("Claude circuit breaker is open")
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Pause before the next attempt, or None to give up and raise error"""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        delay = backoff_delay(attempt, error)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._count("retries")
+        print(f"[WARNING] Claude returned {_status(error)}, retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def _record_error(self, error: Exception):
+        if is_upstream_failure(error):
+            self._count("failures")
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _deadline_error(self) -> LLMUnavailableError:
+        """Count a call whose deadline passed between attempts as a failure"""
+        error = LLMUnavailableError(f"Claude call exceeded its {self.timeout:.0f}s deadline")
+        self._count("failures")
+        self.breaker.record_failure()
+        return error
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state, in-flight calls and counters, for the stats panel"""
+        with self._count_lock:
+            counts = dict(self.counts)
+        return {
+            'breaker_state': self.breaker.state,
+            'breaker_opened': self.breaker.times_opened,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            **counts
+        }
+
+
+class LLMGateway(_GatewayBase):
+    """
+    Thread-safe gateway for the sync Anthropic client
+
+    At most max_in_flight calls run at once; a caller that waits longer than
+    queue_timeout for a slot gets LLMUnavailableError instead of tying up its
+    worker. Each create call has a wall-clock deadline of timeout seconds,
+    covering retries and their pauses. A stream only has to open within the
+    deadline (see stream).
+
+    The SDK's timeout is an httpx timeout, which bounds each socket read but
+    not a slowly trickling response, so create runs the request on a pool of
+    max_in_flight threads and the caller stops waiting at the deadline. The
+    request keeps its slot until it really ends, so abandoned requests still
+    count against max_in_flight and are not retried.
+
+    Args:
+        client: anthropic.Anthropic client
+        max_in_flight: Concurrent Claude calls allowed in this process
+        timeout: Deadline per call in seconds
+        max_retries: Retries after a 429/529 response
+        queue_timeout: Seconds to wait for a free slot
+        breaker: CircuitBreaker, possibly shared with other gateways
+    """
+
+    def __init__(self, client: Any, **settings):
+        super().__init__(client, **settings)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._calls = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="claude-call")
+
+    def _acquire_slot(self):
+        self._check_breaker()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.release()
+            self._count("rejected_busy")
+            raise LLMUnavailableError(f"All {self.max_in_flight} Claude slots busy")
+        self._count("calls")
+        self._count_in_flight(1)
+
+    def _release_slot(self):
+        self._count_in_flight(-1)
+        self._slots.release()
+
+    @contextlib.contextmanager
+    def _slot(self):
+        self._acquire_slot()
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def _count_in_flight(self, delta: int):
+        with self._count_lock:
+            self.in_flight += delta
+
+    def _attempts(self, call, abandoned: threading.Event = None):
+        """
+        Run call(remaining_seconds) with retries until it returns or gives up
+
+        Once abandoned is set (the caller's deadline passed) no further
+        attempt is made and the outcome is not recorded again.
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if abandoned is not None and abandoned.is_set():
+                raise LLMUnavailableError("Claude call abandoned by its caller")
+            if remaining <= 0:
+                raise self._deadline_error()
+            try:
+                return call(remaining)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    if abandoned is None or not abandoned.is_set():
+                        self._record_error(e)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def create(self, **request) -> Any:
+        """client.messages.create(**request) through the gateway"""
+        self._acquire_slot()
+        abandoned = threading.Event()
+        try:
+            future = self._calls.submit(
+                self._attempts, lambda remaining: self.client.messages.create(**request, timeout=remaining),
+                abandoned)
+        except BaseException:
+            self._release_slot()
+            raise
+        # The slot is freed when the request ends, not when the caller gives up
+        future.add_done_callback(lambda _: self._release_slot())
+        try:
+            response = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            abandoned.set()
+            raise self._deadline_error() from None
+        self.breaker.record_success()
+        return response
+
+    @contextlib.contextmanager
+    def stream(self, **request):
+        """
+        client.messages.stream(**request) through the gateway
+
+        Opening the stream is retried like create; once text is flowing a
+        failure is raised to the caller. The deadline bounds opening the
+        stream; after that the SDK timeout bounds each wait for more text,
+        but not the whole answer, which streams for as long as text arrives.
+        """
+        with self._slot():
+            def open_stream(remaining):
+                manager = self.client.messages.stream(**request, timeout=remaining)
+                return manager, manager.__enter__()
+
+            manager, stream = self._attempts(open_stream)
+            try:
+                yield stream
+            except BaseException as e:
+                if isinstance(e, Exception):
+                    self._record_error(e)
+                else:
+                    self.breaker.release()
+                manager.__exit__(type(e), e, e.__traceback__)
+                raise
+            manager.__exit__(None, None, None)
+            self.breaker.record_success()
+
+
+class AsyncLLMGateway(_GatewayBase):
+    """
+    LLMGateway for the async Anthropic client
+
+    Same settings; slots are an asyncio.Semaphore and the deadline is
+    enforced with asyncio.wait_for.
+    """
+
+    def __init__(self, client: Any, **settings):
+        super().__init__(client, **settings)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        self._check_breaker()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            self._count("rejected_busy")
+            raise LLMUnavailableError(f"All {self.max_in_flight} Claude slots busy")
+        self._count("calls")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _attempts(self, call):
+        """Await call(remaining_seconds) with retries until it returns or gives up"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._deadline_error()
+            try:
+                return await asyncio.wait_for(call(remaining), remaining)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    self._record_error(e)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def create(self, **request) -> Any:
+        """await client.messages.create(**request) through the gateway"""
+        async with self._slot():
+            response = await self._attempts(
+                lambda remaining: self.client.messages.create(**request, timeout=remaining))
+            self.breaker.record_success()
+            return response
+
+    @contextlib.asynccontextmanager
+    async def stream(self, **request):
+        """client.messages.stream(**request) through the gateway (see LLMGateway.stream)"""
+        async with self._slot():
+            async def open_stream(remaining):
+                manager = self.client.messages.stream(**request, timeout=remaining)
+                return manager, await manager.__aenter__()
+
+            manager, stream = await self._attempts(open_stream)
+            try:
+                yield stream
+            except BaseException as e:
+                if isinstance(e, Exception):
+                    self._record_error(e)
+                else:
+                    self.breaker.release()
+                await manager.__aexit__(type(e), e, e.__traceback__)
+                raise
+            await manager.__aexit__(None, None, None)
+            self.breaker.record_success()
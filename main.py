@@ -1,8 +1,10 @@
 import os
-import pandas as pd
 import json
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from trend_reader import format_time_range, sample_records
+from trend_cache import load_trend_frame
+from sensor_stats import trend_frame_stats
 
 # Load API key
 load_dotenv()
@@ -23,27 +25,19 @@ def load_all_sensor_data():
     
     for sensor_type, file_path in data_files.items():
         try:
-            # Load CSV with proper encoding
-            try:
-                df = pd.read_csv(file_path, encoding='utf-8', skiprows=2)
-            except UnicodeDecodeError:
-                df = pd.read_csv(file_path, encoding='latin-1', skiprows=2)
+            # Load typed trend frame (columnar cache, CSV only when stale)
+            df = load_trend_frame(file_path)
             
             # Get basic statistics
             stats = {
                 "total_readings": len(df),
-                "time_range": f"{df[' TIMESTAMP'].iloc[0]} to {df[' TIMESTAMP'].iloc[-1]}" if len(df) > 0 else "No data",
-                "sample_data": df.head(5).to_dict('records') if len(df) > 0 else [],
-                "columns": list(df.columns)
+                "time_range": format_time_range(df['TIMESTAMP']),
+                "sample_data": sample_records(df, 5),
+                "columns": df.attrs['raw_columns']
             }
             
             # Add value statistics for numeric columns
-            if ' VALUE' in df.columns:
-                stats["value_stats"] = {
-                    "min": float(df[' VALUE'].min()) if len(df) > 0 else None,
-                    "max": float(df[' VALUE'].max()) if len(df) > 0 else None,
-                    "mean": float(df[' VALUE'].mean()) if len(df) > 0 else None
-                }
+            stats["value_stats"] = trend_frame_stats(df)
             
             all_data[sensor_type] = stats
             
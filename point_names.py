@@ -0,0 +1,137 @@
+# Biosphere 2 Point Name Parsing
+# Splits BACnet point names into equipment, zone and measurement fields
+
+import re
+from typing import Dict, List, Optional
+
+# Point names look like uab2_bio1_b4000_<equipment>_<point>[_<suffix>]_<export id>,
+# e.g. uab2_bio1_b4000_miscrf1_lowlndhum_60764 or uab2_bio1_b4000_ahur5_satmp_930583
+_SITE_PREFIX = re.compile(r"^uab2_bio1_b4000_")
+_EXPORT_ID = re.compile(r"_\d+$")
+
+# Substrings of the point name -> measurement, checked in order
+MEASUREMENT_KEYWORDS = [
+    ("co2", "co2"),
+    ("hum", "humidity"),
+    ("tmp", "temperature"),
+    ("temperature", "temperature"),
+    ("amps", "current"),
+    ("alm", "alarm"),
+    ("vlv", "valve"),
+    ("vfd", "fan"),
+    ("fan", "fan"),
+    ("sf", "fan"),
+    ("occ", "occupancy"),
+    ("reset", "system")
+]
+
+# Substrings of the point or equipment name -> area of the biome
+ZONE_KEYWORDS = [
+    ("lowlnd", "lowland"),
+    ("lolnd", "lowland"),
+    ("mnt", "mountain"),
+    ("mtn", "mountain"),
+    ("tigrpnd", "tiger_pond"),
+    ("nmeter", "north"),
+    ("smeter", "south")
+]
+
+# Words in a question -> measurement they ask about
+QUESTION_MEASUREMENTS = {
+    "humidity": "humidity",
+    "humid": "humidity",
+    "moisture": "humidity",
+    "temperature": "temperature",
+    "temp": "temperature",
+    "hot": "temperature",
+    "cold": "temperature",
+    "warm": "temperature",
+    "co2": "co2",
+    "carbon": "co2",
+    "current": "current",
+    "amps": "current",
+    "alarm": "alarm",
+    "alarms": "alarm",
+    "valve": "valve",
+    "valves": "valve",
+    "fan": "fan",
+    "fans": "fan",
+    "occupancy": "occupancy"
+}
+
+
+# Words in a question -> area of the biome they ask about
+QUESTION_ZONES = {
+    "lowland": "lowland",
+    "lowlands": "lowland",
+    "mountain": "mountain",
+    "tiger": "tiger_pond",
+    "pond": "tiger_pond",
+    "north": "north",
+    "south": "south"
+}
+
+
+def parse_point_name(sensor_type: str) -> Dict[str, Optional[str]]:
+    """
+    Split a sensor id into its filterable parts
+
+    Args:
+        sensor_type: Sensor id (lowercased CSV file stem)
+
+    Returns:
+        Dict with 'equipment' (e.g. 'ahur5', 'miscrf1'), 'point'
+        (e.g. 'lowlndhum'), 'measurement' (e.g. 'humidity') and 'zone'
+        (e.g. 'lowland'); parts that cannot be recognised are None
+    """
+    name = _EXPORT_ID.sub("", _SITE_PREFIX.sub("", sensor_type.lower()))
+    equipment, _, point = name.partition("_")
+    if not point:
+        equipment, point = None, name
+
+    measurement = next((value for key, value in MEASUREMENT_KEYWORDS if key in point), None)
+    zone = next((value for key, value in ZONE_KEYWORDS
+                 if key in point or key == equipment), None)
+
+    return {
+        "equipment": equipment or None,
+        "point": point or None,
+        "measurement": measurement,
+        "zone": zone
+    }
+
+
+def short_sensor_name(sensor_type: str) -> str:
+    """Sensor id without the site prefix, e.g. 'miscrf1_lowlndhum_60764'"""
+    return _SITE_PREFIX.sub("", sensor_type.lower())
+
+
+def strip_export_id(sensor_type: str) -> str:
+    """Sensor id without its export id, e.g. 'miscrf1_lowlndhum' for 'miscrf1_lowlndhum_60764'"""
+    return _EXPORT_ID.sub("", sensor_type.lower())
+
+
+def describe_quantity(description: str) -> str:
+    """
+    Quantity and unit from a trend header description
+
+    'Rainforest MiscRF1_LowLndHum - Relative humidity [%]' gives
+    'Relative humidity [%]'; binary points ('... -   [ ]') give 'on/off'.
+    """
+    _, _, quantity = (description or "").rpartition(" - ")
+    quantity = " ".join(quantity.replace("[ ]", "").split())
+    return quantity or "on/off"
+
+
+def question_measurements(question: str) -> List[str]:
+    """Measurements a question asks about, e.g. ['humidity'] for 'How humid is it?'"""
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return sorted({QUESTION_MEASUREMENTS[word] for word in words if word in QUESTION_MEASUREMENTS})
+
+
+def question_zones(question: str) -> List[str]:
+    """Zones a question asks about, by name ('lowland') or point name ('LOWLNDHUM')"""
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    zones = {QUESTION_ZONES[word] for word in words if word in QUESTION_ZONES}
+    zones.update(value for word in words for key, value in ZONE_KEYWORDS if key in word)
+    return sorted(zones)
@@ -0,0 +1,97 @@
+# Biosphere 2 Prompt Caching
+# Anthropic requests with cached static prefixes, and cache-hit accounting
+
+import threading
+from typing import Any, Dict, List, Optional
+
+
+def cached_text_block(text: str) -> Dict[str, Any]:
+    """System text block ending a cacheable prefix (a cache breakpoint)"""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def build_cached_request(model: str, max_tokens: int, system_blocks: List[Optional[str]],
+                         user_content: str) -> Dict[str, Any]:
+    """
+    Keyword arguments for messages.create / messages.stream with a cached prefix
+
+    Each system block is a cache breakpoint, so list them from most to
+    least stable (e.g. fixed instructions, then the data summary): when
+    only a later block changes, the earlier prefix is still read from the
+    cache. Only the per-question user content is processed in full.
+
+    Claude caches a prefix only above a model-specific minimum length
+    (2048 tokens for Haiku, 1024 for Sonnet and Opus); shorter prefixes
+    are simply sent uncached.
+
+    Args:
+        model: Claude model name
+        max_tokens: Answer length limit
+        system_blocks: Stable text blocks; empty or None entries are skipped
+        user_content: Per-question content (retrieved context and question)
+
+    Returns:
+        Request keyword arguments
+    """
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": [cached_text_block(text) for text in system_blocks if text],
+        "messages": [{"role": "user", "content": user_content}]
+    }
+
+
+class PromptCacheStats:
+    """
+    Running totals of the usage fields of Claude responses
+
+    cache_read_input_tokens were served from the prompt cache,
+    cache_creation_input_tokens were written to it and input_tokens were
+    processed uncached.
+    """
+
+    FIELDS = ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.totals = {field: 0 for field in self.FIELDS}
+        self._lock = threading.Lock()
+
+    def record(self, usage: Any, label: str = "Claude") -> Dict[str, int]:
+        """
+        Add one response's usage and log its cache hit
+
+        Args:
+            usage: response.usage of a Claude message
+            label: Prefix for the log line
+
+        Returns:
+            The usage fields of this response
+        """
+        counts = {field: getattr(usage, field, None) or 0 for field in self.FIELDS}
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += counts["cache_read_input_tokens"] > 0
+            for field, count in counts.items():
+                self.totals[field] += count
+
+        prompt_tokens = counts["input_tokens"] + counts["cache_read_input_tokens"] + counts["cache_creation_input_tokens"]
+        print(f"[CACHE] {label}: {counts['cache_read_input_tokens']}/{prompt_tokens} prompt tokens from cache, "
+              f"{counts['cache_creation_input_tokens']} written, {counts['input_tokens']} uncached, "
+              f"{counts['output_tokens']} output")
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals, the share of requests that hit the cache and of prompt tokens read from it"""
+        with self._lock:
+            prompt_tokens = (self.totals["input_tokens"] + self.totals["cache_read_input_tokens"]
+                             + self.totals["cache_creation_input_tokens"])
+            return {
+                'requests': self.requests,
+                'cache_hits': self.cache_hits,
+                'hit_rate': round(self.cache_hits / self.requests, 3) if self.requests else 0.0,
+                'cached_token_share': round(self.totals["cache_read_input_tokens"] / prompt_tokens, 3)
+                if prompt_tokens else 0.0,
+                **self.totals
+            }
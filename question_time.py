@@ -0,0 +1,99 @@
+# Biosphere 2 Question Time Parsing
+# Finds the dates, periods and time-of-day words a question asks about
+
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+_MONTH = (r"(january|february|march|april|may|june|july|august|september|october|november|december"
+          r"|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec)\b\.?")
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+
+# 2025-10-05, 2025/10/05
+_ISO_DATE = re.compile(r"\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b")
+# 10/5, 10/5/2025
+_US_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+# October 5, Oct 5th 2025, September 21-28
+_MONTH_DAY = re.compile(rf"\b{_MONTH}\s+{_DAY}(?:\s*(?:-|to|through|and)\s*{_DAY})?(?:,?\s+(\d{{4}}))?\b")
+# 5 October, 5th of Oct 2025
+_DAY_MONTH = re.compile(rf"\b{_DAY}\s+(?:of\s+)?{_MONTH}(?:\s+(\d{{4}}))?\b")
+# in October, during September
+_WHOLE_MONTH = re.compile(rf"\b(?:in|during|for|throughout)\s+{_MONTH}(?:\s+(\d{{4}}))?\b")
+
+# Words that ask about a point in time rather than the whole monitoring
+# period; hourly and daily rollup chunks only answer these
+TIME_WORDS = frozenset("""
+hour hours hourly day days daily date dates when night nights overnight morning
+mornings afternoon afternoons evening evenings midnight noon today yesterday
+monday tuesday wednesday thursday friday saturday sunday weekday weekend
+""".split())
+
+
+def _year(text: Optional[str], default_year: int) -> int:
+    if not text:
+        return default_year
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _day(year: int, month: int, day: int) -> Optional[datetime]:
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
+
+def question_dates(question: str, default_year: int) -> List[Tuple[datetime, datetime]]:
+    """
+    Calendar windows named in a question
+
+    Args:
+        question: User question
+        default_year: Year for dates written without one
+
+    Returns:
+        (start, end) pairs, end exclusive: one day per date, the whole
+        span for 'September 21-28' and the whole month for 'in October'
+    """
+    text = question.lower()
+    windows = []
+
+    def add(start, days=1):
+        if start is not None:
+            windows.append((start, start + timedelta(days=days)))
+
+    for year, month, day in _ISO_DATE.findall(text):
+        add(_day(int(year), int(month), int(day)))
+    for month, day, year in _US_DATE.findall(text):
+        add(_day(_year(year, default_year), int(month), int(day)))
+    for month, first, last, year in _MONTH_DAY.findall(text):
+        start = _day(_year(year, default_year), MONTHS[month[:3]], int(first))
+        if start is not None and last and int(last) >= int(first):
+            add(start, int(last) - int(first) + 1)
+        else:
+            add(start)
+    for day, month, year in _DAY_MONTH.findall(text):
+        add(_day(_year(year, default_year), MONTHS[month[:3]], int(day)))
+    for month, year in _WHOLE_MONTH.findall(text):
+        start = datetime(_year(year, default_year), MONTHS[month[:3]], 1)
+        end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+        windows.append((start, end))
+    return windows
+
+
+def question_time_range(question: str, default_year: int) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) window covering every date in the question, or None"""
+    windows = question_dates(question, default_year)
+    if not windows:
+        return None
+    return min(start for start, _ in windows), max(end for _, end in windows)
+
+
+def has_time_intent(question: str) -> bool:
+    """Whether a question asks about particular hours, days or dates"""
+    words = set(re.findall(r"[a-z]+", question.lower()))
+    return bool(words & TIME_WORDS) or question_time_range(question, datetime.now().year) is not None
@@ -2,24 +2,198 @@
 # Retrieval-Augmented Generation for Enhanced Sensor Data Analysis
 
 import os
+import re
 import json
+import time
+import hashlib
+import glob
+import threading
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple, Optional
 import sqlite3
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single-process use only
+    fcntl = None
+
+from context_builder import build_context
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from point_names import parse_point_name, question_measurements
+from question_time import has_time_intent, question_time_range
+
 # For embeddings and vector operations
 try:
     import openai
     from sentence_transformers import SentenceTransformer
     import faiss
+    from vector_backends import (build_params, create_index, exact_rerank, rerank_factor, resolve_params,
+                                 search_parameters, supports_remove)
     HAS_EMBEDDINGS = True
 except ImportError:
     HAS_EMBEDDINGS = False
     print("Install required packages: pip install openai sentence-transformers faiss-cpu")
 
+
+# Bump when chunk text or metadata changes so saved indexes are rebuilt, including
+# when the CSV loader parses different rows or stats from the same files
+# (5: rows with commas in STATUS_TAG are no longer dropped)
+CHUNK_FORMAT_VERSION = 5
+
+# Bump when stored vectors change meaning so saved indexes are rebuilt
+# (2: embeddings are L2-normalized, so inner product is cosine similarity)
+INDEX_FORMAT_VERSION = 2
+
+# Metadata fields search() can filter on; equipment, zone and measurement are
+# parsed from the point name when the chunk metadata does not carry them
+METADATA_FILTER_FIELDS = ('sensor_type', 'chunk_type', 'period', 'equipment', 'zone', 'measurement')
+
+# Hybrid search: candidates taken from each of FAISS and BM25, and the
+# reciprocal rank fusion constant used to merge the two rankings
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+
+# Rollup periods chunked by default. On the current data, daily buckets add
+# about 75 chunks per sensor (3.9k chunks in all). Hourly ones add about 430
+# more per sensor, growing the corpus to 24.8k chunks, with embedding time
+# and index memory growing to match.
+DEFAULT_ROLLUP_PERIODS = ('daily',)
+
+# Bound variables per IN (...) list; SQLite builds before 3.32 allow only 999
+SQLITE_BATCH_SIZE = 900
+
+def _batches(items: List[Any], size: int = SQLITE_BATCH_SIZE):
+    """Consecutive slices of items of at most size elements"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _format_stat(value, suffix: str = "") -> str:
+    """Format a statistic for chunk text, or 'N/A' if it is missing"""
+    return "N/A" if value is None else f"{value:.2f}{suffix}"
+
+def compute_data_hash(data_dir: str = "data") -> str:
+    """
+    Hash the raw sensor CSV files so persisted indexes can be validated
+    
+    Args:
+        data_dir: Directory containing the sensor CSV exports
+        
+    Returns:
+        Hex digest covering the name and content of every CSV file
+    """
+    digest = hashlib.sha256()
+    for file_path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scale embedding rows to unit length, so inner product is cosine similarity
+    
+    Args:
+        embeddings: Array of shape (n, dimension) or (dimension,)
+        
+    Returns:
+        Contiguous float32 array of shape (n, dimension)
+    """
+    embeddings = np.array(embeddings, dtype=np.float32, ndmin=2, order='C', copy=None)
+    faiss.normalize_L2(embeddings)  # In place when given a contiguous float32 matrix
+    return embeddings
+
+# Storage formats of embeddings.embedding_vector
+EMBEDDING_STORAGE_TYPES = ("float32", "float16", "int8")
+
+def quantize_embeddings(embeddings: np.ndarray, storage: str = "float32") -> List[Tuple[bytes, float]]:
+    """
+    Encode embedding rows for the embeddings table
+    
+    float16 halves the BLOB size. int8 quarters it: each vector is scaled
+    by its own max |x| / 127 and rounded, and the scale is stored with it.
+    
+    Args:
+        embeddings: float32 array of shape (n, dimension)
+        storage: One of EMBEDDING_STORAGE_TYPES
+        
+    Returns:
+        (blob, scale) per row; scale is 1.0 except for int8
+    """
+    if storage not in EMBEDDING_STORAGE_TYPES:
+        raise ValueError(f"Unknown embedding storage '{storage}', expected one of {EMBEDDING_STORAGE_TYPES}")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    
+    if storage == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return [(row.tobytes(), float(scale)) for row, scale in zip(codes, scales)]
+    
+    rows = embeddings.astype(storage)
+    return [(row.tobytes(), 1.0) for row in rows]
+
+def normalize_query(query: str) -> str:
+    """Normalize question text for cache keys: lowercase, single-spaced"""
+    return " ".join(query.lower().split())
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of query embeddings with a time-to-live
+    
+    Entries are evicted least-recently-used once max_size is reached and
+    treated as misses once they are older than ttl_seconds.
+    """
+    
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, embedding: np.ndarray):
+        """Store an embedding, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds
+            }
+
 class Biosphere2RAGDatabase:
     """
     RAG Database for Biosphere 2 Sensor Data Analysis
@@ -31,13 +205,39 @@ class Biosphere2RAGDatabase:
     - Multi-modal data integration
     """
     
-    def __init__(self, db_path: str = "biosphere2_rag.db", embedding_model: str = "all-MiniLM-L6-v2"):
+    def __init__(self, db_path: str = "biosphere2_rag.db", embedding_model: str = "all-MiniLM-L6-v2",
+                 index_dir: str = None, query_cache_size: int = 256, query_cache_ttl: float = 3600,
+                 index_backend: str = "flat", index_params: Dict[str, Any] = None,
+                 embedding_storage: str = "float32", rollup_periods: Tuple[str, ...] = DEFAULT_ROLLUP_PERIODS):
         self.db_path = db_path
         self.embedding_model_name = embedding_model
         self.embedding_model = None
         self.vector_index = None
+        self.index_mmapped = False
+        # ANN backend (see vector_backends): 'flat', 'hnsw' or 'ivfpq', with
+        # build parameters and query-time ef_search/nprobe
+        self.index_backend = index_backend
+        self.index_params = resolve_params(index_backend, index_params) if HAS_EMBEDDINGS else {}
+        self.doc_ids = {}
+        self.doc_store = {}
+        self.metadata_index = {}
+        self.lexical_index = BM25Index()
+        self.time_ids = np.empty(0, dtype=np.int64)
+        self.time_starts = np.empty(0, dtype='datetime64[s]')
+        self.time_ends = np.empty(0, dtype='datetime64[s]')
+        self.default_year = datetime.now().year
+        self.data_hash = None
+        self.source_hashes = {}
+        self.index_dir = index_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), "rag_index")
         self.documents = []
         self.metadata = []
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl)
+        if embedding_storage not in EMBEDDING_STORAGE_TYPES:
+            raise ValueError(f"Unknown embedding storage '{embedding_storage}', "
+                             f"expected one of {EMBEDDING_STORAGE_TYPES}")
+        self.embedding_storage = embedding_storage
+        # Rollup buckets chunked per sensor (see _create_rollup_chunks)
+        self.rollup_periods = tuple(rollup_periods)
         
         # Initialize database
         self.init_database()
@@ -81,13 +281,58 @@ class Biosphere2RAGDatabase:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 doc_id TEXT,
                 embedding_vector BLOB,
+                vector_dtype TEXT DEFAULT 'float32',
+                vector_scale REAL DEFAULT 1.0,
                 FOREIGN KEY (doc_id) REFERENCES documents (doc_id)
             )
         ''')
         
+        # Databases created before quantized storage: existing rows are float32
+        cursor.execute('PRAGMA table_info(embeddings)')
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'vector_dtype' not in columns:
+            cursor.execute("ALTER TABLE embeddings ADD COLUMN vector_dtype TEXT DEFAULT 'float32'")
+        if 'vector_scale' not in columns:
+            cursor.execute("ALTER TABLE embeddings ADD COLUMN vector_scale REAL DEFAULT 1.0")
+        
         self.conn.commit()
         print(f"[SUCCESS] RAG Database initialized: {self.db_path}")
     
+    def close(self):
+        """Close the SQLite connection (e.g. in a pre-fork master process)"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def reconnect(self):
+        """
+        Open a fresh SQLite connection
+        
+        SQLite connections must not be carried across fork(); forked workers
+        call this instead of using the connection opened by their parent.
+        """
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    @contextmanager
+    def sync_lock(self):
+        """
+        Exclusive lock across processes for rebuilding the index
+        
+        Held around sync_documents and save_vector_index, so workers that
+        load separately (no preload) do not delete and insert embedding rows
+        or write rag_index/ files at the same time. The lock is an fcntl
+        lock on <db_path>.lock and is released if the process dies.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.db_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
     def load_embedding_model(self):
         """Load sentence transformer model for embeddings"""
         try:
@@ -97,12 +342,14 @@ class Biosphere2RAGDatabase:
             print(f"[ERROR] Error loading embedding model: {e}")
             self.embedding_model = None
     
-    def create_document_chunks(self, sensor_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def create_document_chunks(self, sensor_data: Dict[str, Any],
+                               include_overview: bool = True) -> List[Dict[str, Any]]:
         """
         Create document chunks from sensor data for RAG processing
         
         Args:
             sensor_data: Dictionary containing sensor data
+            include_overview: Whether to append the system overview chunk
             
         Returns:
             List of document chunks with metadata
@@ -125,6 +372,7 @@ class Biosphere2RAGDatabase:
                 "metadata": {
                     "sensor_type": sensor_type,
                     "chunk_type": "summary",
+                    "description": data.get('sensor_description', ''),
                     "total_readings": data.get('total_readings', 0),
                     "time_range": data.get('time_range', 'Unknown')
                 }
@@ -148,33 +396,103 @@ class Biosphere2RAGDatabase:
                             "chunk_type": "sample_data",
                             "sample_index": i,
                             "timestamp": sample.get(' TIMESTAMP', 'Unknown'),
-                            "value": sample.get(' VALUE', None)
+                            "value": sample.get(' VALUE', None),
+                            "status": sample.get(' STATUS_TAG', None)
                         }
                     }
                     chunks.append(sample_chunk)
             
             # 3. Statistical analysis chunk
             if 'value_stats' in data:
+                value_stats = data['value_stats'] or {}
+                stats_lines = ""
+                if value_stats.get('std') is not None:
+                    stats_lines += f"""
+                    - Standard deviation: {_format_stat(value_stats.get('std'))}
+                    - Median: {_format_stat(value_stats.get('p50'))} (5th-95th percentile: {_format_stat(value_stats.get('p5'))} to {_format_stat(value_stats.get('p95'))})
+                    - Time-weighted average: {_format_stat(value_stats.get('time_weighted_mean'))}"""
+                if value_stats.get('duty_cycle') is not None:
+                    stats_lines += f"""
+                    - Duty cycle: {_format_stat(value_stats['duty_cycle'] * 100, '%')} of the time on, {value_stats.get('transitions', 0)} on/off transitions"""
+                
                 stats_chunk = {
                     "doc_id": f"{sensor_type}_statistics",
                     "content": f"""
                     {sensor_type.replace('_', ' ').title()} Statistical Analysis:
-                    - Minimum value: {data['value_stats'].get('min', 'N/A')}
-                    - Maximum value: {data['value_stats'].get('max', 'N/A')}
-                    - Average value: {data['value_stats'].get('mean', 'N/A')}
+                    - Minimum value: {value_stats.get('min', 'N/A')}
+                    - Maximum value: {value_stats.get('max', 'N/A')}
+                    - Average value: {value_stats.get('mean', 'N/A')}{stats_lines}
                     - Data quality: {'Good' if data.get('total_readings', 0) > 100 else 'Limited'}
                     """,
                     "metadata": {
                         "sensor_type": sensor_type,
                         "chunk_type": "statistics",
-                        "min_value": data['value_stats'].get('min'),
-                        "max_value": data['value_stats'].get('max'),
-                        "mean_value": data['value_stats'].get('mean')
+                        "description": data.get('sensor_description', ''),
+                        "min_value": value_stats.get('min'),
+                        "max_value": value_stats.get('max'),
+                        "mean_value": value_stats.get('mean'),
+                        "value_stats": value_stats
                     }
                 }
                 chunks.append(stats_chunk)
         
-        # 4. System overview chunk
+            # 4. Hourly/daily rollup chunks
+            chunks.extend(self._create_rollup_chunks(sensor_type, data))
+        
+        # 5. System overview chunk
+        if include_overview:
+            chunks.append(self._create_overview_chunk(sensor_data))
+        
+        return chunks
+    
+    def _create_rollup_chunks(self, sensor_type: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Create one compact chunk per rollup bucket (see sensor_stats.compute_rollups)
+        
+        Only the periods in self.rollup_periods are chunked.
+        
+        The text names the sensor and the bucket's date and hours so that
+        questions about a time window retrieve the matching bucket; the
+        window itself is kept in metadata as start_time/end_time.
+        """
+        chunks = []
+        title = sensor_type.replace('_', ' ').title()
+        description = data.get('sensor_description', '')
+        
+        for period, buckets in (data.get('rollups') or {}).items():
+            if period not in self.rollup_periods:
+                continue
+            for bucket in buckets:
+                start = datetime.strptime(bucket['start'], '%Y/%m/%d %H:%M:%S')
+                end = datetime.strptime(bucket['end'], '%Y/%m/%d %H:%M:%S')
+                if period == 'daily':
+                    window = f"{start:%A %B %d %Y}"
+                else:
+                    window = f"{start:%A %B %d %Y}, {start:%H:%M} to {end:%H:%M}"
+                
+                chunks.append({
+                    "doc_id": f"{sensor_type}_{period}_{re.sub(r'[^0-9]', '', bucket['start'])[:10]}",
+                    "content": (f"{title} ({description}) {period} rollup for {window}: "
+                                f"average {bucket['mean']:.2f}, min {bucket['min']:.2f}, "
+                                f"max {bucket['max']:.2f} over {bucket['count']} readings"),
+                    "metadata": {
+                        "sensor_type": sensor_type,
+                        "chunk_type": "rollup",
+                        "description": description,
+                        "period": period,
+                        "start_time": bucket['start'],
+                        "end_time": bucket['end'],
+                        "time_range": f"{bucket['start']} to {bucket['end']}",
+                        "count": bucket['count'],
+                        "min_value": bucket['min'],
+                        "max_value": bucket['max'],
+                        "mean_value": bucket['mean']
+                    }
+                })
+        return chunks
+    
+    def _create_overview_chunk(self, sensor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the system overview chunk, which summarizes every sensor"""
         total_readings = sum(data.get('total_readings', 0) for data in sensor_data.values())
         system_chunk = {
             "doc_id": "system_overview",
@@ -193,155 +511,697 @@ class Biosphere2RAGDatabase:
                 "total_readings": total_readings
             }
         }
-        chunks.append(system_chunk)
-        
-        return chunks
+        return system_chunk
     
-    def add_documents(self, chunks: List[Dict[str, Any]]):
-        """Add document chunks to the database"""
-        cursor = self.conn.cursor()
+    def add_documents(self, chunks: List[Dict[str, Any]], batch_size: int = 64):
+        """
+        Add document chunks to the database
         
-        for chunk in chunks:
-            try:
-                # Insert document
-                cursor.execute('''
-                    INSERT OR REPLACE INTO documents (doc_id, content, metadata)
-                    VALUES (?, ?, ?)
-                ''', (
-                    chunk['doc_id'],
-                    chunk['content'],
-                    json.dumps(chunk['metadata'])
+        Chunk texts are embedded in mini-batches and every document and
+        embedding row is written with executemany in a single transaction.
+        
+        Args:
+            chunks: Document chunks from create_document_chunks
+            batch_size: Number of chunk texts encoded per model call
+        """
+        if not chunks:
+            print("[WARNING] No documents to add")
+            return
+        
+        doc_ids = [chunk['doc_id'] for chunk in chunks]
+        document_rows = [
+            (chunk['doc_id'], chunk['content'], json.dumps(chunk['metadata']))
+            for chunk in chunks
+        ]
+        
+        # Generate embeddings in mini-batches if model is available
+        embedding_rows = []
+        if self.embedding_model:
+            texts = [chunk['content'] for chunk in chunks]
+            total_start = time.perf_counter()
+            
+            for batch_number, start in enumerate(range(0, len(texts), batch_size), 1):
+                batch_texts = texts[start:start + batch_size]
+                batch_start = time.perf_counter()
+                batch_embeddings = normalize_embeddings(self.embedding_model.encode(
+                    batch_texts,
+                    batch_size=batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
                 ))
+                batch_seconds = time.perf_counter() - batch_start
                 
-                # Generate embedding if model is available
-                if self.embedding_model:
-                    embedding = self.embedding_model.encode(chunk['content'])
-                    
-                    # Store embedding
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO embeddings (doc_id, embedding_vector)
-                        VALUES (?, ?)
-                    ''', (
-                        chunk['doc_id'],
-                        embedding.tobytes()
-                    ))
+                for doc_id, (blob, scale) in zip(doc_ids[start:start + batch_size],
+                                                 quantize_embeddings(batch_embeddings, self.embedding_storage)):
+                    embedding_rows.append((doc_id, blob, self.embedding_storage, scale))
                 
-                self.documents.append(chunk)
+                print(f"[BATCH] Embedding batch {batch_number}: {len(batch_texts)} chunks "
+                      f"in {batch_seconds:.3f}s ({len(batch_texts) / max(batch_seconds, 1e-9):.1f} chunks/s)")
+            
+            print(f"[INFO] Embedded {len(texts)} chunks in {time.perf_counter() - total_start:.3f}s "
+                  f"(batch size {batch_size})")
+        
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO documents (doc_id, content, metadata)
+                    VALUES (?, ?, ?)
+                ''', document_rows)
                 
-            except Exception as e:
-                print(f"[ERROR] Error adding document {chunk['doc_id']}: {e}")
+                if embedding_rows:
+                    # embeddings.doc_id is not UNIQUE, so drop stale vectors before re-inserting
+                    cursor.executemany('DELETE FROM embeddings WHERE doc_id = ?',
+                                       [(doc_id,) for doc_id in doc_ids])
+                    cursor.executemany('''
+                        INSERT INTO embeddings (doc_id, embedding_vector, vector_dtype, vector_scale)
+                        VALUES (?, ?, ?, ?)
+                    ''', embedding_rows)
+        except Exception as e:
+            print(f"[ERROR] Error adding documents: {e}")
+            return
         
-        self.conn.commit()
+        self.documents.extend(chunks)
         print(f"[SUCCESS] Added {len(chunks)} documents to RAG database")
     
+    def load_embeddings(self, where: str = "", params: Tuple = (),
+                        batch_rows: int = 2048) -> Tuple[np.ndarray, Dict[int, str], np.ndarray]:
+        """
+        Read stored embeddings into one preallocated float32 matrix
+        
+        Rows are fetched in batches; each batch's BLOBs of one storage type
+        are joined and decoded with a single np.frombuffer, then dequantized
+        in place, so no per-vector arrays are built.
+        
+        Args:
+            where: Optional WHERE clause on the embeddings table
+            params: Parameters for the WHERE clause
+            batch_rows: Rows fetched and decoded at a time
+            
+        Returns:
+            (row ids, {row id: doc_id}, matrix of shape (n, dimension))
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM embeddings {where}', params)
+        count = cursor.fetchone()[0]
+        
+        ids = np.empty(count, dtype=np.int64)
+        doc_ids = {}
+        matrix = None
+        
+        cursor.execute(f'''
+            SELECT id, doc_id, embedding_vector, vector_dtype, vector_scale
+            FROM embeddings {where} ORDER BY id
+        ''', params)
+        start = 0
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            stop = start + len(rows)
+            row_ids, row_doc_ids, blobs, dtypes, scales = zip(*rows)
+            ids[start:stop] = row_ids
+            doc_ids.update(zip(row_ids, row_doc_ids))
+            dtypes = np.array([dtype or "float32" for dtype in dtypes])
+            
+            for dtype in np.unique(dtypes):
+                positions = np.flatnonzero(dtypes == dtype)
+                data = np.frombuffer(b"".join(blobs[i] for i in positions), dtype=dtype)
+                if matrix is None:
+                    matrix = np.empty((count, data.size // len(positions)), dtype=np.float32)
+                block = data.reshape(len(positions), -1)
+                if dtype == "int8":
+                    block = block * np.array([scales[i] for i in positions], dtype=np.float32)[:, None]
+                matrix[start + positions] = block
+            start = stop
+        
+        if matrix is None:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        return ids, doc_ids, matrix
+    
     def build_vector_index(self):
         """Build FAISS vector index for similarity search"""
         if not self.embedding_model:
             print("[ERROR] No embedding model available")
             return
         
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT doc_id, embedding_vector FROM embeddings')
-        results = cursor.fetchall()
+        ids, doc_ids, embeddings_array = self.load_embeddings()
         
-        if not results:
+        if not len(ids):
             print("[ERROR] No embeddings found")
             return
         
-        # Extract embeddings
-        embeddings = []
-        doc_ids = []
+        # Build FAISS index (rows stored before INDEX_FORMAT_VERSION 2 are not unit length)
+        embeddings_array = normalize_embeddings(embeddings_array)
         
-        for doc_id, embedding_bytes in results:
-            embedding = np.frombuffer(embedding_bytes, dtype=np.float32)
-            embeddings.append(embedding)
-            doc_ids.append(doc_id)
+        # FAISS ids are embeddings-table row ids so single vectors can be removed or added later
+        build_start = time.perf_counter()
+        self.index_mmapped = False
+        try:
+            self.vector_index = create_index(self.index_backend, embeddings_array, ids, self.index_params)
+        except ValueError as e:
+            # Falling back to flat here would save an index that never matches the configured
+            # backend, so every load would rebuild it; make the operator choose instead
+            print(f"[ERROR] Cannot build {self.index_backend} index: {e}")
+            raise ValueError(f"Cannot build {self.index_backend} index over {len(ids)} embeddings ({e}); "
+                             f"use the flat backend or other index_params") from e
         
-        # Build FAISS index
-        embeddings_array = np.array(embeddings)
-        dimension = embeddings_array.shape[1]
+        # Store doc_ids for retrieval
+        self.doc_ids = doc_ids
+        self.load_document_store()
         
-        self.vector_index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        self.vector_index.add(embeddings_array)
+        print(f"[SUCCESS] Vector index built with {len(ids)} embeddings "
+              f"({self.index_backend}, {time.perf_counter() - build_start:.2f}s)")
+    
+    def sync_documents(self, sensor_data: Dict[str, Any], source_hashes: Dict[str, str],
+                       batch_size: int = 64):
+        """
+        Bring documents, embeddings and the vector index up to date with sensor_data
         
-        # Store doc_ids for retrieval
+        Only sensors whose source hash differs from the one recorded for the
+        current index are re-chunked and re-embedded; their old rows are
+        deleted and their vectors removed from the index in place.
+        
+        Args:
+            sensor_data: Output of load_all_sensor_data
+            source_hashes: Mapping of sensor id to source file content hash
+            batch_size: Embedding mini-batch size for new chunks
+        """
+        cursor = self.conn.cursor()
+        
+        if self.index_mmapped:
+            # A memory-mapped index is read-only; continue from an in-memory copy
+            self.load_vector_index()
+        
+        if self.vector_index is None:
+            # Nothing to diff against - start from empty tables
+            with self.conn:
+                cursor.execute('DELETE FROM embeddings')
+                cursor.execute('DELETE FROM documents')
+            self.source_hashes = {}
+        
+        added = [s for s in sensor_data if s not in self.source_hashes]
+        changed = [s for s in sensor_data if s in self.source_hashes
+                   and self.source_hashes[s] != source_hashes.get(s)]
+        removed = [s for s in self.source_hashes if s not in sensor_data]
+        
+        if not (added or changed or removed):
+            print("[INFO] RAG documents already up to date")
+            return
+        
+        print(f"[SYNC] {len(added)} added, {len(changed)} changed, {len(removed)} removed sensors")
+        
+        # Rows of outdated sensors, plus the overview chunk which summarizes all sensors.
+        # IN lists are sent in batches, below SQLite's limit on bound variables.
+        stale_doc_ids = []
+        for sensors in _batches(changed + removed + added):
+            cursor.execute(f'''
+                SELECT doc_id FROM documents
+                WHERE json_extract(metadata, '$.sensor_type') IN ({",".join("?" * len(sensors))})
+            ''', sensors)
+            stale_doc_ids.extend(row[0] for row in cursor.fetchall())
+        stale_doc_ids.append("system_overview")
+        
+        stale_ids = []
+        for doc_ids in _batches(stale_doc_ids):
+            cursor.execute(f'SELECT id FROM embeddings WHERE doc_id IN ({",".join("?" * len(doc_ids))})', doc_ids)
+            stale_ids.extend(row[0] for row in cursor.fetchall())
+        stale_ids = np.array(stale_ids, dtype=np.int64)
+        
+        with self.conn:
+            for doc_ids in _batches(stale_doc_ids):
+                placeholders = ",".join("?" * len(doc_ids))
+                cursor.execute(f'DELETE FROM embeddings WHERE doc_id IN ({placeholders})', doc_ids)
+                cursor.execute(f'DELETE FROM documents WHERE doc_id IN ({placeholders})', doc_ids)
+        
+        # HNSW graphs cannot drop vectors, so they are rebuilt from the embeddings table instead
+        rebuild = self.vector_index is None or (len(stale_ids) > 0 and not supports_remove(self.index_backend))
+        if not rebuild and len(stale_ids):
+            self.vector_index.remove_ids(stale_ids)
+            for row_id in stale_ids:
+                self.doc_ids.pop(int(row_id), None)
+        
+        chunks = self.create_document_chunks({s: sensor_data[s] for s in added + changed},
+                                             include_overview=False)
+        chunks.append(self._create_overview_chunk(sensor_data))
+        
+        # New rows get rowids above every row still stored
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM embeddings')
+        last_id = cursor.fetchone()[0]
+        self.add_documents(chunks, batch_size=batch_size)
+        
+        if rebuild:
+            self.build_vector_index()
+        else:
+            ids, doc_ids, vectors = self.load_embeddings('WHERE id > ?', (last_id,))
+            if len(ids):
+                self.vector_index.add_with_ids(normalize_embeddings(vectors), ids)
+                self.doc_ids.update(doc_ids)
+            print(f"[SUCCESS] Vector index updated in place ({self.vector_index.ntotal} embeddings)")
+        
+        self.source_hashes = {s: source_hashes.get(s) for s in sensor_data}
+        self.load_document_store()
+    
+    def load_document_store(self):
+        """
+        Load every indexed document into memory, keyed by FAISS id
+        
+        One joined query fetches content and metadata for all vectors in
+        the index and metadata JSON is decoded here, once, so search does
+        no per-hit SQL or JSON work.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT e.id, d.doc_id, d.content, d.metadata
+            FROM embeddings e JOIN documents d ON d.doc_id = e.doc_id
+        ''')
+        
+        self.doc_store = {
+            row_id: {
+                'doc_id': doc_id,
+                'content': content,
+                'metadata': json.loads(metadata_json) if metadata_json else {}
+            }
+            for row_id, doc_id, content, metadata_json in cursor.fetchall()
+            if row_id in self.doc_ids
+        }
+        self.build_metadata_index()
+        self.build_lexical_index()
+    
+    def build_metadata_index(self):
+        """
+        Build the inverted index from metadata values to FAISS ids
+        
+        metadata_index maps each field in METADATA_FILTER_FIELDS to
+        {value: sorted int64 id array}. Chunks with a time window
+        (start_time/end_time, or a summary's 'start to end' time_range) are
+        also kept in parallel time_ids/time_starts/time_ends arrays.
+        """
+        postings = {field: {} for field in METADATA_FILTER_FIELDS}
+        point_names = {}
+        time_ids, starts, ends = [], [], []
+        
+        for row_id, document in self.doc_store.items():
+            metadata = document['metadata']
+            sensor_type = metadata.get('sensor_type')
+            if sensor_type and sensor_type not in point_names:
+                point_names[sensor_type] = parse_point_name(sensor_type)
+            parsed = point_names.get(sensor_type, {})
+            
+            for field in METADATA_FILTER_FIELDS:
+                value = metadata.get(field, parsed.get(field))
+                if value is not None:
+                    postings[field].setdefault(value, []).append(row_id)
+            
+            start, end = metadata.get('start_time'), metadata.get('end_time')
+            if start is None and ' to ' in str(metadata.get('time_range', '')):
+                start, end = metadata['time_range'].split(' to ', 1)
+            if start is not None and end is not None:
+                time_ids.append(row_id)
+                starts.append(start)
+                ends.append(end)
+        
+        self.metadata_index = {
+            field: {value: np.array(sorted(ids), dtype=np.int64) for value, ids in values.items()}
+            for field, values in postings.items()
+        }
+        
+        # Unparseable windows become NaT and never match a time filter
+        self.time_ids = np.array(time_ids, dtype=np.int64)
+        self.time_starts = pd.to_datetime(pd.Series(starts, dtype=object), format='%Y/%m/%d %H:%M:%S',
+                                          errors='coerce').to_numpy(dtype='datetime64[s]')
+        self.time_ends = pd.to_datetime(pd.Series(ends, dtype=object), format='%Y/%m/%d %H:%M:%S',
+                                        errors='coerce').to_numpy(dtype='datetime64[s]')
+        
+        # Dates asked about without a year ('October 5') fall in the year of the latest data
+        latest = self.time_ends[~np.isnat(self.time_ends)]
+        self.default_year = int(str(latest.max())[:4]) if len(latest) else datetime.now().year
+    
+    def build_lexical_index(self):
+        """
+        Build the BM25 index over chunk text plus parsed point-name tokens
+        
+        The point name's equipment, point, measurement and zone are added to
+        each chunk's text, so 'lowland humidity' finds LOWLNDHUM chunks and
+        'SATMP' finds the AHU supply air temperature point.
+        """
+        point_tokens = {}
+        
+        def lexical_text(document):
+            sensor_type = document['metadata'].get('sensor_type')
+            if sensor_type and sensor_type not in point_tokens:
+                point_tokens[sensor_type] = " ".join(
+                    value for value in parse_point_name(sensor_type).values() if value)
+            return f"{document['content']} {point_tokens.get(sensor_type, '')}"
+        
+        self.lexical_index = BM25Index()
+        self.lexical_index.build((row_id, lexical_text(document)) for row_id, document in self.doc_store.items())
+    
+    def filter_ids(self, filters: Dict[str, Any] = None,
+                   time_range: Tuple[Any, Any] = None) -> Optional[np.ndarray]:
+        """
+        Resolve metadata filters to the matching FAISS ids
+        
+        Args:
+            filters: {field: value or list of values}; values of one field
+                are OR-ed, different fields are AND-ed
+            time_range: (start, end) datetimes or strings; keeps chunks
+                whose time window overlaps it (either end may be None)
+            
+        Returns:
+            Sorted int64 array of matching ids, or None when no filter is given
+        """
+        ids = None
+        
+        for field, wanted in (filters or {}).items():
+            if field not in METADATA_FILTER_FIELDS:
+                raise ValueError(f"Unknown filter field '{field}', expected one of {METADATA_FILTER_FIELDS}")
+            if isinstance(wanted, (str, int, float)):
+                wanted = [wanted]
+            postings = self.metadata_index.get(field, {})
+            matches = [postings[value] for value in wanted if value in postings]
+            field_ids = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            ids = field_ids if ids is None else np.intersect1d(ids, field_ids, assume_unique=True)
+        
+        if time_range is not None:
+            start, end = time_range
+            overlaps = np.ones(len(self.time_ids), dtype=bool)
+            if start is not None:
+                overlaps &= self.time_ends > np.datetime64(pd.Timestamp(start), 's')
+            if end is not None:
+                overlaps &= self.time_starts < np.datetime64(pd.Timestamp(end), 's')
+            time_ids = np.sort(self.time_ids[overlaps])
+            ids = time_ids if ids is None else np.intersect1d(ids, time_ids, assume_unique=True)
+        
+        return ids
+    
+    def _index_paths(self) -> Tuple[str, str]:
+        """Return the (index, mapping) file paths for the embedding model"""
+        key = hashlib.sha256(self.embedding_model_name.encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.index_dir, f"faiss_{key}")
+        return f"{base}.index", f"{base}.json"
+    
+    def save_vector_index(self, data_hash: str) -> bool:
+        """
+        Persist the FAISS index and doc_id mapping to disk
+        
+        Args:
+            data_hash: Hash of the source data the index was built from
+            
+        Returns:
+            True if the index was written
+        """
+        if self.vector_index is None:
+            print("[ERROR] No vector index to save")
+            return False
+        
+        index_path, mapping_path = self._index_paths()
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            
+            # Write to temp files and rename so concurrent workers never read a partial index
+            tmp_suffix = f".tmp{os.getpid()}"
+            faiss.write_index(self.vector_index, index_path + tmp_suffix)
+            with open(mapping_path + tmp_suffix, "w", encoding="utf-8") as f:
+                json.dump({
+                    "embedding_model": self.embedding_model_name,
+                    "data_hash": data_hash,
+                    "doc_ids": {str(row_id): doc_id for row_id, doc_id in self.doc_ids.items()},
+                    "source_hashes": self.source_hashes,
+                    "chunk_version": CHUNK_FORMAT_VERSION,
+                    "rollup_periods": list(self.rollup_periods),
+                    "index_version": INDEX_FORMAT_VERSION,
+                    "index_backend": self.index_backend,
+                    "index_params": build_params(self.index_backend, self.index_params),
+                    "created_at": datetime.now().isoformat()
+                }, f)
+            os.replace(index_path + tmp_suffix, index_path)
+            os.replace(mapping_path + tmp_suffix, mapping_path)
+        except Exception as e:
+            print(f"[ERROR] Failed to save vector index: {e}")
+            return False
+        
+        self.data_hash = data_hash
+        print(f"[SUCCESS] Vector index saved: {index_path}")
+        return True
+    
+    def load_vector_index(self, data_hash: str = None, mmap: bool = False) -> bool:
+        """
+        Load the persisted FAISS index for the embedding model
+        
+        Args:
+            data_hash: If given, the saved index must have been built from
+                this data. If omitted, the last saved index is loaded as
+                the starting point for sync_documents.
+            mmap: Memory-map the vectors read-only instead of copying them
+                into the heap, so forked workers share the page cache
+            
+        Returns:
+            True if an index was loaded and search is ready
+        """
+        if not HAS_EMBEDDINGS:
+            return False
+        
+        index_path, mapping_path = self._index_paths()
+        if not (os.path.exists(index_path) and os.path.exists(mapping_path)):
+            print("[INFO] No saved vector index found")
+            return False
+        
+        try:
+            with open(mapping_path, "r", encoding="utf-8") as f:
+                mapping = json.load(f)
+            
+            if mapping.get("embedding_model") != self.embedding_model_name:
+                print("[INFO] Saved vector index uses a different embedding model")
+                return False
+            if mapping.get("chunk_version", 1) != CHUNK_FORMAT_VERSION:
+                print("[INFO] Saved vector index uses an older chunk format")
+                return False
+            if mapping.get("rollup_periods", ["hourly", "daily"]) != list(self.rollup_periods):
+                print("[INFO] Saved vector index was chunked with other rollup periods")
+                return False
+            if mapping.get("index_version", 1) != INDEX_FORMAT_VERSION:
+                print("[INFO] Saved vector index uses an older index format")
+                return False
+            if data_hash is not None and mapping.get("data_hash") != data_hash:
+                print("[INFO] Saved vector index is stale")
+                return False
+            
+            doc_ids = {int(row_id): doc_id for row_id, doc_id in mapping.get("doc_ids", {}).items()}
+            
+            # The index is only usable if the embedding rows it points at are still stored
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT id FROM embeddings')
+            if not set(doc_ids).issubset(row[0] for row in cursor.fetchall()):
+                print("[INFO] Saved vector index does not match embeddings table")
+                return False
+            
+            saved_backend = (mapping.get("index_backend", "flat"), mapping.get("index_params", {}))
+            if saved_backend != (self.index_backend, build_params(self.index_backend, self.index_params)):
+                # The stored vectors are still valid: rebuild the index from them, no re-embedding
+                print(f"[INFO] Saved vector index uses {saved_backend[0]} {saved_backend[1]}; "
+                      f"rebuilding as {self.index_backend}")
+                self.source_hashes = mapping.get("source_hashes", {})
+                self.build_vector_index()
+                if self.vector_index is None or not self.save_vector_index(mapping.get("data_hash")):
+                    return False
+                if not mmap:
+                    return True
+                doc_ids = self.doc_ids
+            
+            if mmap:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+            else:
+                index = faiss.read_index(index_path)
+            if index.ntotal != len(doc_ids):
+                print("[INFO] Saved vector index is incomplete")
+                return False
+        except Exception as e:
+            print(f"[ERROR] Failed to load vector index: {e}")
+            return False
+        
+        self.vector_index = index
+        self.index_mmapped = mmap
         self.doc_ids = doc_ids
+        self.source_hashes = mapping.get("source_hashes", {})
+        self.data_hash = mapping.get("data_hash")
+        self.load_document_store()
+        print(f"[SUCCESS] Vector index loaded with {index.ntotal} embeddings"
+              f"{' (memory-mapped)' if mmap else ''}")
+        return True
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query once so the vector can be reused for several lookups
         
-        print(f"[SUCCESS] Vector index built with {len(embeddings)} embeddings")
+        Results are cached by normalized text (see QueryEmbeddingCache), so
+        repeated questions skip the model. The model lowercases its input,
+        so encoding the normalized text gives the same vector. The vector
+        is unit length, like the indexed ones.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            float32 array of shape (1, dimension)
+        """
+        key = normalize_query(query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            embedding = normalize_embeddings(self.embedding_model.encode([key]))
+            self.query_cache.put(key, embedding)
+        return embedding
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5, query_embedding: np.ndarray = None,
+               filters: Dict[str, Any] = None, time_range: Tuple[Any, Any] = None,
+               hybrid: bool = True, include_rollups: bool = None) -> List[Dict[str, Any]]:
         """
-        Search for relevant documents using semantic similarity
+        Search for relevant documents using semantic similarity and BM25
+        
+        Hourly and daily rollups far outnumber the other chunks, so they are
+        only searched for questions about particular hours, days or dates.
+        Dates named in the query ('on October 5') become the time_range.
         
         Args:
             query: Search query
             top_k: Number of top results to return
+            query_embedding: Precomputed vector from encode_query; when
+                given, the query text is not encoded again
+            filters: Metadata filters, e.g. {'measurement': 'humidity',
+                'chunk_type': ['summary', 'statistics']} (see filter_ids)
+            time_range: (start, end) window the chunks must overlap
+            hybrid: Fuse FAISS with BM25 over chunk text and point-name
+                tokens (reciprocal rank fusion); False for vectors only
+            include_rollups: Search rollup chunks; by default only when
+                the query has time intent (see question_time) or a
+                time_range is given. Ignored if filters set chunk_type.
             
         Returns:
-            List of relevant documents with similarity scores
+            List of relevant documents with similarity scores (the cosine
+            similarity to the query, also for BM25-only hits) and, for
+            hybrid search, the fusion_score they were ranked by
         """
         if not self.vector_index or not self.embedding_model:
             print("[ERROR] Vector index or embedding model not available")
             return []
         
+        # Dates in the question narrow the search to their window, unless nothing falls in it
+        allowed_ids = None
+        if time_range is None:
+            parsed_range = question_time_range(query, self.default_year)
+            if parsed_range is not None:
+                allowed_ids = self.filter_ids(filters, parsed_range)
+                if len(allowed_ids):
+                    time_range = parsed_range
+                else:
+                    allowed_ids = None
+        
+        # Keep rollups out of general questions so they do not crowd out summaries
+        if include_rollups is None:
+            include_rollups = time_range is not None or has_time_intent(query)
+        if not include_rollups and 'chunk_type' not in (filters or {}):
+            filters = dict(filters or {}, chunk_type=[
+                chunk_type for chunk_type in self.metadata_index.get('chunk_type', {}) if chunk_type != 'rollup'])
+            allowed_ids = None
+        
+        # Restrict the search to matching ids; FAISS skips every other vector
+        selector = None
+        candidates = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+        if allowed_ids is None:
+            allowed_ids = self.filter_ids(filters, time_range)
+        if allowed_ids is not None:
+            if len(allowed_ids) == 0:
+                return []
+            selector = faiss.IDSelectorBatch(allowed_ids)
+            candidates = min(candidates, len(allowed_ids))
+        params = search_parameters(self.index_backend, self.index_params, selector)
+        
         # Encode query
-        query_embedding = self.embedding_model.encode([query])
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
         
-        # Search
-        scores, indices = self.vector_index.search(query_embedding, top_k)
+        # Search; approximate (IVF-PQ) hits are over-fetched and re-ranked on their stored vectors
+        fetch = max(candidates, min(candidates * rerank_factor(self.index_backend, self.index_params),
+                                    SQLITE_BATCH_SIZE))
+        scores, indices = self.vector_index.search(query_embedding, fetch, params=params)
+        scores, indices = scores[0][indices[0] >= 0], indices[0][indices[0] >= 0]
+        if fetch > candidates and len(indices):
+            scores, indices = self.exact_rerank(query_embedding[0], indices, candidates)
+        vector_scores = {int(idx): float(score) for score, idx in zip(scores, indices)}
+        fused_scores = None
+        ranked_ids = list(vector_scores)
         
-        # Retrieve documents
-        results = []
-        cursor = self.conn.cursor()
+        if hybrid and len(self.lexical_index):
+            # Measurements named in the question ('humid' -> humidity) match point-name tokens
+            lexical_query = " ".join([query] + question_measurements(query))
+            lexical_hits = self.lexical_index.search(lexical_query, candidates, allowed_ids)
+            fused_scores = reciprocal_rank_fusion(
+                [ranked_ids, [row_id for row_id, _ in lexical_hits]], k=RRF_K)
+            ranked_ids = list(fused_scores)
         
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.doc_ids):
-                doc_id = self.doc_ids[idx]
-                
-                cursor.execute('''
-                    SELECT content, metadata FROM documents WHERE doc_id = ?
-                ''', (doc_id,))
-                
-                result = cursor.fetchone()
-                if result:
-                    content, metadata_json = result
-                    metadata = json.loads(metadata_json)
-                    
-                    results.append({
-                        'doc_id': doc_id,
-                        'content': content,
-                        'metadata': metadata,
-                        'similarity_score': float(score)
-                    })
+        # Retrieve documents from the in-memory store (no per-hit SQL or JSON decoding)
+        results = []
+        for idx in ranked_ids[:top_k]:
+            document = self.doc_store.get(idx)
+            if document:
+                score = vector_scores.get(idx)
+                if score is None:
+                    score = float(self.vector_index.reconstruct(idx) @ query_embedding[0])
+                result = {
+                    'doc_id': document['doc_id'],
+                    'content': document['content'],
+                    'metadata': document['metadata'],
+                    'similarity_score': score
+                }
+                if fused_scores is not None:
+                    result['fusion_score'] = fused_scores[idx]
+                results.append(result)
         
         return results
     
-    def get_context_for_question(self, question: str, max_context_length: int = 2000) -> str:
+    def exact_rerank(self, query_vector: np.ndarray, row_ids: np.ndarray,
+                     k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact cosine scores for approximate hits, from the embeddings table
+        
+        Args:
+            query_vector: Unit query vector of shape (dimension,)
+            row_ids: Candidate embeddings-table ids (at most SQLITE_BATCH_SIZE)
+            k: Results to keep
+            
+        Returns:
+            (scores, row ids) of the best k candidates, best first
+        """
+        placeholders = ",".join("?" * len(row_ids))
+        ids, _, vectors = self.load_embeddings(f'WHERE id IN ({placeholders})',
+                                               tuple(int(row_id) for row_id in row_ids))
+        return exact_rerank(query_vector, ids, normalize_embeddings(vectors), k)
+    
+    def get_context_for_question(self, question: str, max_context_tokens: int = 500,
+                                 search_results: List[Dict[str, Any]] = None,
+                                 compact: bool = False) -> str:
         """
         Get relevant context for a question using RAG
         
+        Chunks are whitespace-compacted, deduplicated and packed into the
+        token budget by score per token (see context_builder).
+        
         Args:
             question: User question
-            max_context_length: Maximum context length in characters
+            max_context_tokens: Approximate token budget for the context
+            search_results: Results of an earlier search for the question;
+                when given, no new search is run
+            compact: Encode sensor stats, rollups and samples as rows of
+                shared-header tables with rounded numbers
             
         Returns:
             Relevant context string
         """
         # Search for relevant documents
-        search_results = self.search(question, top_k=5)
+        if search_results is None:
+            search_results = self.search(question, top_k=5)
         
-        # Build context
-        context_parts = []
-        current_length = 0
-        
-        for result in search_results:
-            if current_length + len(result['content']) <= max_context_length:
-                context_parts.append(f"[{result['metadata'].get('sensor_type', 'unknown')}] {result['content']}")
-                current_length += len(result['content'])
-            else:
-                break
-        
-        return "\n\n".join(context_parts)
+        return build_context(search_results, max_context_tokens, compact=compact)
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Get database statistics"""
@@ -355,6 +1215,11 @@ class Biosphere2RAGDatabase:
         cursor.execute('SELECT COUNT(*) FROM embeddings')
         embedding_count = cursor.fetchone()[0]
         
+        # Stored vector bytes, by storage type
+        cursor.execute('SELECT vector_dtype, COUNT(*), SUM(LENGTH(embedding_vector)) FROM embeddings GROUP BY vector_dtype')
+        embedding_storage = {dtype or 'float32': {'count': count, 'bytes': size or 0}
+                             for dtype, count, size in cursor.fetchall()}
+        
         # Count sensor readings
         cursor.execute('SELECT COUNT(*) FROM sensor_readings')
         reading_count = cursor.fetchone()[0]
@@ -363,7 +1228,12 @@ class Biosphere2RAGDatabase:
             'documents': doc_count,
             'embeddings': embedding_count,
             'sensor_readings': reading_count,
-            'vector_index_size': len(self.doc_ids) if hasattr(self, 'doc_ids') else 0
+            'vector_index_size': len(self.doc_ids),
+            'embedding_storage': embedding_storage,
+            'index_backend': self.index_backend,
+            'index_params': self.index_params,
+            'data_hash': self.data_hash,
+            'query_cache': self.query_cache.stats()
         }
 
 # Example usage and testing
@@ -571,11 +571,10 @@ def ask_question_endpoint():
         
         # Use RAG if available, otherwise fallback to simple context
         if rag_ready and rag_database:
-            # Get RAG-enhanced context
-            rag_context = rag_database.get_context_for_question(question)
-            
-            # Search for relevant sources
-            sources = rag_database.search(question, top_k=3)
+            # Search once; the context and the listed sources share the results
+            search_results = rag_database.search(question, top_k=5)
+            rag_context = rag_database.get_context_for_question(question, search_results=search_results)
+            sources = search_results[:3]
             
             # Enhanced prompt with RAG context
             prompt = f"""
@@ -7,6 +7,8 @@ import os
 from typing import Dict, List, Any, Tuple
 from datetime import datetime
 import sqlite3
+from trend_cache import load_trend_frame
+from sensor_stats import trend_frame_stats
 
 class RainforestTableAnalyzer:
     """
@@ -43,12 +45,12 @@ class RainforestTableAnalyzer:
         try:
             # Load data
             if csv_file_path and os.path.exists(csv_file_path):
-                df = pd.read_csv(csv_file_path)
+                df = self._load_csv(csv_file_path)
             else:
                 # Try to find CSV file in data directory
                 csv_file = os.path.join(self.data_directory, f"{table_name}.csv")
                 if os.path.exists(csv_file):
-                    df = pd.read_csv(csv_file)
+                    df = self._load_csv(csv_file)
                 else:
                     print(f"❌ No data file found for {table_name}")
                     return {"error": "No data file found"}
@@ -83,6 +85,11 @@ class RainforestTableAnalyzer:
             if len(numeric_cols) > 0:
                 analysis["statistical_summary"] = df[numeric_cols].describe().to_dict()
             
+            # Time-aware sensor statistics for trend exports
+            sensor_stats = trend_frame_stats(df)
+            if sensor_stats:
+                analysis["sensor_stats"] = sensor_stats
+            
             # Store analysis
             self.tables_analysis[table_name] = analysis
             
@@ -93,6 +100,14 @@ class RainforestTableAnalyzer:
             print(f"❌ Error analyzing {table_name}: {e}")
             return {"error": str(e)}
     
+    def _load_csv(self, csv_file_path: str) -> pd.DataFrame:
+        """Load a table, using the typed trend cache for BACnet trend exports"""
+        try:
+            return load_trend_frame(csv_file_path)
+        except ValueError:
+            # Not a trend export - plain CSV table
+            return pd.read_csv(csv_file_path)
+    
     def _analyze_column(self, df: pd.DataFrame, column_name: str) -> Dict[str, Any]:
         """Analyze individual column characteristics"""
         col_data = df[column_name]
@@ -0,0 +1,169 @@
+# Biosphere 2 Sensor Statistics
+# Vectorized per-sensor statistics and time-bucket rollups of trend exports
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+
+from trend_reader import TIMESTAMP_FORMAT
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def is_binary_point(values: np.ndarray, metadata: str = "") -> bool:
+    """
+    Return True for on/off points such as FANSTS, OCCCMD or SFCMD
+
+    BACnet binary points carry trueText/falseText in the header metadata
+    line; otherwise a point is binary if every value is 0 or 1.
+    """
+    if "trueText=" in metadata:
+        return True
+    return len(values) > 0 and bool(np.isin(values, (0.0, 1.0)).all())
+
+
+def compute_sensor_stats(timestamps: np.ndarray, values: np.ndarray, metadata: str = "",
+                         percentiles: Sequence[int] = PERCENTILES) -> Dict[str, Any]:
+    """
+    Compute summary statistics for one sensor in a single vectorized pass
+
+    Trend points are logged irregularly (on change of value or on an
+    interval), so the time-weighted statistics hold each value until the
+    next reading (zero-order hold); the last reading carries no weight.
+
+    Args:
+        timestamps: datetime64 reading times
+        values: Float readings (NaN for missing)
+        metadata: Header metadata line, used to recognise binary points
+        percentiles: Percentiles to report, as p<N> keys
+
+    Returns:
+        Dict with count, min, max, mean, std, p<N> percentiles and
+        time_weighted_mean; for binary points also duty_cycle (fraction of
+        time on) and transitions (number of state changes). Values are
+        plain floats/ints or None when they cannot be computed.
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+    values = np.asarray(values, dtype=np.float64)
+
+    valid = ~np.isnan(values) & ~np.isnat(timestamps)
+    timestamps, values = timestamps[valid], values[valid]
+
+    if len(timestamps) > 1 and (np.diff(timestamps) < np.timedelta64(0, "ns")).any():
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, values = timestamps[order], values[order]
+
+    count = len(values)
+    stats = {
+        "count": count,
+        "min": None,
+        "max": None,
+        "mean": None,
+        "std": None,
+        **{f"p{p}": None for p in percentiles},
+        "time_weighted_mean": None
+    }
+    if count == 0:
+        return stats
+
+    stats.update({
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if count > 1 else 0.0
+    })
+    for p, value in zip(percentiles, np.percentile(values, percentiles)):
+        stats[f"p{p}"] = float(value)
+
+    # Seconds each reading is held until the next one
+    held = np.diff(timestamps).astype("timedelta64[ns]").astype(np.float64) / 1e9
+    total_time = held.sum()
+    if total_time > 0:
+        stats["time_weighted_mean"] = float(np.dot(values[:-1], held) / total_time)
+    else:
+        stats["time_weighted_mean"] = stats["mean"]
+
+    if is_binary_point(values, metadata):
+        on = values != 0
+        if total_time > 0:
+            stats["duty_cycle"] = float(held[on[:-1]].sum() / total_time)
+        else:
+            stats["duty_cycle"] = float(on.mean())
+        stats["transitions"] = int(np.count_nonzero(on[1:] != on[:-1]))
+
+    return stats
+
+
+def trend_frame_stats(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """
+    compute_sensor_stats for a typed trend frame (see trend_reader)
+
+    Returns:
+        The statistics dict, or None if the frame has no TIMESTAMP/VALUE
+    """
+    if "TIMESTAMP" not in df.columns or "VALUE" not in df.columns:
+        return None
+    return compute_sensor_stats(df["TIMESTAMP"].to_numpy(), df["VALUE"].to_numpy(),
+                                df.attrs.get("metadata", ""))
+
+
+# Rollup periods: name -> pandas offset alias
+ROLLUP_PERIODS = {
+    "daily": "D",
+    "hourly": "h"
+}
+
+
+def compute_rollups(timestamps: np.ndarray, values: np.ndarray,
+                    periods: Dict[str, str] = ROLLUP_PERIODS) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Resample one sensor into time buckets (hourly and daily by default)
+
+    Buckets without readings are dropped. Times are 'YYYY/MM/DD HH:MM:SS'
+    strings as in the source files; 'end' is exclusive.
+
+    Args:
+        timestamps: datetime64 reading times
+        values: Float readings (NaN for missing)
+        periods: Mapping of rollup name to pandas offset alias
+
+    Returns:
+        {name: [{'start', 'end', 'count', 'min', 'max', 'mean'}, ...]}
+    """
+    series = pd.Series(np.asarray(values, dtype=np.float64),
+                       index=pd.DatetimeIndex(timestamps)).dropna()
+    series = series[series.index.notna()].sort_index()
+
+    rollups = {}
+    for name, alias in periods.items():
+        if series.empty:
+            rollups[name] = []
+            continue
+
+        buckets = series.resample(alias).agg(["count", "min", "max", "mean"])
+        buckets = buckets[buckets["count"] > 0]
+        starts = buckets.index
+        ends = starts + pd.tseries.frequencies.to_offset(alias)
+
+        rollups[name] = [
+            {"start": start, "end": end, "count": int(count),
+             "min": float(low), "max": float(high), "mean": float(mean)}
+            for start, end, count, low, high, mean in zip(
+                starts.strftime(TIMESTAMP_FORMAT), ends.strftime(TIMESTAMP_FORMAT),
+                buckets["count"].to_numpy(), buckets["min"].to_numpy(),
+                buckets["max"].to_numpy(), buckets["mean"].to_numpy()
+            )
+        ]
+    return rollups
+
+
+def trend_frame_rollups(df: pd.DataFrame) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    compute_rollups for a typed trend frame (see trend_reader)
+
+    Returns:
+        The rollups dict, or None if the frame has no TIMESTAMP/VALUE
+    """
+    if "TIMESTAMP" not in df.columns or "VALUE" not in df.columns:
+        return None
+    return compute_rollups(df["TIMESTAMP"].to_numpy(), df["VALUE"].to_numpy())
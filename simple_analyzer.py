@@ -6,6 +6,7 @@ import pandas as pd
 import json
 from datetime import datetime
 from typing import Dict, List, Any
+from trend_cache import load_trend_frame
 
 class SimpleRainforestAnalyzer:
     """Simple analyzer for Rainforest tables without Unicode issues"""
@@ -45,14 +46,18 @@ class SimpleRainforestAnalyzer:
             }
         
         try:
-            # Try different encodings
+            # Trend exports come from the typed columnar cache
             df = None
-            for encoding in ['utf-8', 'latin-1', 'cp1252']:
-                try:
-                    df = pd.read_csv(csv_file, encoding=encoding)
-                    break
-                except:
-                    continue
+            try:
+                df = load_trend_frame(csv_file)
+            except ValueError:
+                # Not a trend export - try different encodings
+                for encoding in ['utf-8', 'latin-1', 'cp1252']:
+                    try:
+                        df = pd.read_csv(csv_file, encoding=encoding)
+                        break
+                    except:
+                        continue
             
             if df is None:
                 return {
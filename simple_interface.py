@@ -1,123 +1,365 @@
 import os
+import hashlib
 import pandas as pd
 import json
 from anthropic import Anthropic
 from dotenv import load_dotenv
+from trend_reader import format_time_range, sample_records
+from trend_cache import load_trend_frame
+from sensor_stats import trend_frame_stats, trend_frame_rollups
+from context_builder import format_number, format_table
+from point_names import describe_quantity, short_sensor_name
+from prompt_cache import PromptCacheStats, build_cached_request
+from llm_gateway import LLMGateway
 
 # Load API key
 load_dotenv()
 client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+prompt_cache_stats = PromptCacheStats()
+# Bounded, deadline-limited Claude calls with retries and a circuit breaker
+gateway = LLMGateway(client)
 
-def load_all_sensor_data():
-    """Load and analyze all CSV files in the data folder automatically"""
+# Manifest of already-parsed CSV files (path, size, mtime, content hash, stats)
+SENSOR_MANIFEST_PATH = os.path.join("cache", "ingest_manifest.json")
+# Bump when parsing changes; bump rag_database.CHUNK_FORMAT_VERSION with it, as
+# sync_documents only re-chunks files whose content hash changed
+MANIFEST_VERSION = 4
+
+def load_sensor_file(file_path):
+    """Parse one sensor CSV file and return its statistics dictionary"""
+    filename = os.path.basename(file_path)
+    
+    try:
+        df = load_trend_frame(file_path)
+    except ValueError as e:
+        # Not the standard trend layout - use the tolerant generic parser
+        print(f"[WARNING] {filename}: {e} - falling back to generic CSV parser")
+        return load_sensor_file_generic(file_path)
+    
+    if len(df) == 0:
+        raise ValueError("Failed to load CSV or file is empty")
+    
+    raw_columns = df.attrs['raw_columns']
+    
+    stats = {
+        "filename": filename,
+        "sensor_description": df.attrs['description'] or df.attrs['metadata'],
+        "total_readings": len(df),
+        "time_range": format_time_range(df['TIMESTAMP']),
+        "sample_data": sample_records(df, 5),
+        "columns": raw_columns
+    }
+    
+    # count/min/max/mean/std, percentiles, time-weighted mean, duty cycle...
+    stats["value_stats"] = trend_frame_stats(df)
+    
+    # Hourly and daily buckets, chunked separately for time-window questions
+    stats["rollups"] = trend_frame_rollups(df)
+    
+    return stats
+
+def read_csv_generic(file_path):
+    """Read a sensor CSV of unknown layout with the tolerant python-engine reader (no stats)"""
+    df = None
+    try:
+        # Try with UTF-8 encoding first
+        try:
+            # Use on_bad_lines='skip' for pandas >= 1.3, or error_bad_lines=False for older versions
+            try:
+                df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, on_bad_lines='skip', engine='python')
+            except TypeError:
+                # Fallback for older pandas versions
+                df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, error_bad_lines=False, warn_bad_lines=False, engine='python')
+        except UnicodeDecodeError:
+            # Try with latin-1 encoding
+            try:
+                df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, on_bad_lines='skip', engine='python')
+            except TypeError:
+                df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, error_bad_lines=False, warn_bad_lines=False, engine='python')
+    except Exception as parse_error:
+        # If all else fails, try with quotechar to handle commas in fields
+        try:
+            df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, quotechar='"', on_bad_lines='skip', engine='python')
+        except:
+            try:
+                df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, quotechar='"', on_bad_lines='skip', engine='python')
+            except:
+                raise parse_error
+    
+    return df
+
+def load_sensor_file_generic(file_path):
+    """Parse a sensor CSV of unknown layout with the tolerant python-engine reader"""
+    filename = os.path.basename(file_path)
+    
+    # Try to extract a more readable name from the file
+    # Read first line to get sensor description
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+            second_line = f.readline().strip()
+    except:
+        first_line = ""
+        second_line = ""
+    
+    # Load CSV with proper encoding and error handling
+    df = read_csv_generic(file_path)
+    
+    if df is None or len(df) == 0:
+        raise ValueError("Failed to load CSV or file is empty")
+    
+    # Get basic statistics
+    stats = {
+        "filename": filename,
+        "sensor_description": second_line if second_line else first_line,
+        "total_readings": len(df),
+        "time_range": f"{df[' TIMESTAMP'].iloc[0]} to {df[' TIMESTAMP'].iloc[-1]}" if len(df) > 0 and ' TIMESTAMP' in df.columns else "No data",
+        "sample_data": df.head(5).to_dict('records') if len(df) > 0 else [],
+        "columns": list(df.columns)
+    }
+    
+    # Add value statistics for numeric columns
+    if ' VALUE' in df.columns:
+        # Convert to numeric, coercing errors to NaN
+        numeric_values = pd.to_numeric(df[' VALUE'], errors='coerce')
+        numeric_values = numeric_values.dropna()  # Remove NaN values
+        
+        if len(numeric_values) > 0:
+            stats["value_stats"] = {
+                "min": float(numeric_values.min()),
+                "max": float(numeric_values.max()),
+                "mean": float(numeric_values.mean())
+            }
+        else:
+            stats["value_stats"] = {
+                "min": None,
+                "max": None,
+                "mean": None
+            }
+    
+    return stats
+
+def file_content_hash(file_path):
+    """Return the SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path=SENSOR_MANIFEST_PATH):
+    """Load the ingest manifest, or an empty one if missing or outdated"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(manifest, manifest_path=SENSOR_MANIFEST_PATH):
+    """Write the ingest manifest atomically"""
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, default=str)
+    os.replace(tmp_path, manifest_path)
+
+def sensor_source_hashes(manifest_path=SENSOR_MANIFEST_PATH):
+    """Map sensor_id -> content hash for every file in the ingest manifest"""
+    manifest = load_manifest(manifest_path)
+    return {entry["sensor_id"]: entry["sha256"] for entry in manifest["files"].values()}
+
+# Default cap on CSV parsing processes; each one holds a pandas worker in memory
+MAX_DEFAULT_LOAD_WORKERS = 4
+
+def default_load_workers():
+    """
+    Worker count for parallel CSV parsing
+    
+    SENSOR_LOAD_WORKERS if set, otherwise the CPUs this process may run on
+    (not the host's CPU count, which containers report) capped at
+    MAX_DEFAULT_LOAD_WORKERS.
+    """
+    if os.getenv("SENSOR_LOAD_WORKERS"):
+        return max(1, int(os.getenv("SENSOR_LOAD_WORKERS")))
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is Linux-only
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, MAX_DEFAULT_LOAD_WORKERS))
+
+def _load_sensor_file_result(file_path):
+    """Process-pool entry point: parse a file and return (file_path, stats, error)"""
+    try:
+        return file_path, load_sensor_file(file_path), None
+    except Exception as e:
+        import traceback
+        return file_path, None, f"{e}\n{traceback.format_exc()}"
+
+def iter_sensor_files(file_paths, workers=None):
+    """
+    Parse sensor CSV files, yielding (file_path, stats, error) as each finishes
+    
+    Files are spread across a process pool when workers > 1; results stream
+    back in completion order. If a pool cannot be started (e.g. on serverless
+    runtimes without multiprocessing) or breaks (a worker was killed, e.g.
+    out of memory), the files not yielded yet are parsed in-process.
+    """
+    workers = default_load_workers() if workers is None else workers
+    workers = min(workers, len(file_paths))
+    yielded = set()
+    
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_load_sensor_file_result, file_path) for file_path in file_paths]
+                for future in as_completed(futures):
+                    result = future.result()
+                    yielded.add(result[0])
+                    yield result
+            return
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"[WARNING] Process pool unavailable ({e!r}) - parsing "
+                  f"{len(file_paths) - len(yielded)} remaining files sequentially")
+    
+    for file_path in file_paths:
+        if file_path not in yielded:
+            yield _load_sensor_file_result(file_path)
+
+def sync_sensor_data(data_dir="data", manifest_path=SENSOR_MANIFEST_PATH, workers=None):
+    """
+    Load all sensor CSVs, re-parsing only files that changed since the last run
+    
+    Files whose size and mtime match the manifest reuse their stored stats.
+    If size or mtime differ, the content hash decides whether to re-parse.
+    Files that need parsing are spread across a process pool of ``workers``
+    processes (default: see default_load_workers).
+    
+    Returns:
+        (all_data, changes) where changes maps 'added', 'changed' and
+        'removed' to lists of sensor ids
+    """
     import glob
     
     # Find all CSV files in data folder
-    csv_files = glob.glob("data/*.csv")
+    csv_files = glob.glob(os.path.join(data_dir, "*.csv"))
+    changes = {"added": [], "changed": [], "removed": []}
     
     if not csv_files:
         print("[WARNING] No CSV files found in data folder!")
-        return {}
-    
-    print(f"[INFO] Found {len(csv_files)} CSV files in data folder")
+    else:
+        print(f"[INFO] Found {len(csv_files)} CSV files in data folder")
     
-    all_data = {}
+    manifest = load_manifest(manifest_path)
+    previous = manifest["files"]
+    current = {}
+    results = {}
+    pending = {}
+    reused = 0
     
     for file_path in sorted(csv_files):
+        # Extract sensor name from filename
+        filename = os.path.basename(file_path)
+        # Use filename without extension as sensor identifier
+        sensor_id = filename.replace('.csv', '').lower()
+        
         try:
-            # Extract sensor name from filename
-            filename = os.path.basename(file_path)
-            # Use filename without extension as sensor identifier
-            sensor_id = filename.replace('.csv', '').lower()
-            
-            # Try to extract a more readable name from the file
-            # Read first line to get sensor description
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    second_line = f.readline().strip()
-            except:
-                first_line = ""
-                second_line = ""
-            
-            print(f"Loading {sensor_id}...")
+            file_stat = os.stat(file_path)
+            entry = previous.get(filename)
             
-            # Load CSV with proper encoding and error handling
-            df = None
-            try:
-                # Try with UTF-8 encoding first
-                try:
-                    # Use on_bad_lines='skip' for pandas >= 1.3, or error_bad_lines=False for older versions
-                    try:
-                        df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, on_bad_lines='skip', engine='python')
-                    except TypeError:
-                        # Fallback for older pandas versions
-                        df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, error_bad_lines=False, warn_bad_lines=False, engine='python')
-                except UnicodeDecodeError:
-                    # Try with latin-1 encoding
-                    try:
-                        df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, on_bad_lines='skip', engine='python')
-                    except TypeError:
-                        df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, error_bad_lines=False, warn_bad_lines=False, engine='python')
-            except Exception as parse_error:
-                # If all else fails, try with quotechar to handle commas in fields
-                try:
-                    df = pd.read_csv(file_path, encoding='utf-8', skiprows=2, quotechar='"', on_bad_lines='skip', engine='python')
-                except:
-                    try:
-                        df = pd.read_csv(file_path, encoding='latin-1', skiprows=2, quotechar='"', on_bad_lines='skip', engine='python')
-                    except:
-                        raise parse_error
+            if entry and entry["size"] == file_stat.st_size and entry["mtime"] == file_stat.st_mtime:
+                current[filename] = entry
+                results[sensor_id] = entry["stats"]
+                reused += 1
+                continue
             
-            if df is None or len(df) == 0:
-                raise ValueError("Failed to load CSV or file is empty")
+            content_hash = file_content_hash(file_path)
+            if entry and entry["sha256"] == content_hash:
+                # Touched but identical - refresh mtime only
+                entry = dict(entry, size=file_stat.st_size, mtime=file_stat.st_mtime)
+                current[filename] = entry
+                results[sensor_id] = entry["stats"]
+                reused += 1
+                continue
             
-            # Get basic statistics
-            stats = {
-                "filename": filename,
-                "sensor_description": second_line if second_line else first_line,
-                "total_readings": len(df),
-                "time_range": f"{df[' TIMESTAMP'].iloc[0]} to {df[' TIMESTAMP'].iloc[-1]}" if len(df) > 0 and ' TIMESTAMP' in df.columns else "No data",
-                "sample_data": df.head(5).to_dict('records') if len(df) > 0 else [],
-                "columns": list(df.columns)
+            pending[file_path] = {
+                "sensor_id": sensor_id,
+                "size": file_stat.st_size,
+                "mtime": file_stat.st_mtime,
+                "sha256": content_hash,
+                "is_new": entry is None
             }
             
-            # Add value statistics for numeric columns
-            if ' VALUE' in df.columns:
-                # Convert to numeric, coercing errors to NaN
-                numeric_values = pd.to_numeric(df[' VALUE'], errors='coerce')
-                numeric_values = numeric_values.dropna()  # Remove NaN values
-                
-                if len(numeric_values) > 0:
-                    stats["value_stats"] = {
-                        "min": float(numeric_values.min()),
-                        "max": float(numeric_values.max()),
-                        "mean": float(numeric_values.mean())
-                    }
-                else:
-                    stats["value_stats"] = {
-                        "min": None,
-                        "max": None,
-                        "mean": None
-                    }
-            
-            all_data[sensor_id] = stats
-            print(f"[OK] {sensor_id}: {len(df)} readings")
-            
         except Exception as e:
             print(f"[ERROR] Loading {file_path}: {e}")
-            import traceback
-            traceback.print_exc()
-            all_data[sensor_id] = {"error": str(e), "filename": filename}
+            results[sensor_id] = {"error": str(e), "filename": filename}
+    
+    if pending:
+        print(f"[INFO] Parsing {len(pending)} new or changed files...")
     
+    for file_path, stats, error in iter_sensor_files(list(pending), workers):
+        filename = os.path.basename(file_path)
+        info = pending[file_path]
+        sensor_id = info["sensor_id"]
+        
+        if error:
+            print(f"[ERROR] Loading {file_path}: {error}")
+            results[sensor_id] = {"error": error.splitlines()[0], "filename": filename}
+            continue
+        
+        results[sensor_id] = stats
+        current[filename] = {
+            "sensor_id": sensor_id,
+            "size": info["size"],
+            "mtime": info["mtime"],
+            "sha256": info["sha256"],
+            "stats": stats
+        }
+        changes["added" if info["is_new"] else "changed"].append(sensor_id)
+        print(f"[OK] {sensor_id}: {stats['total_readings']} readings")
+    
+    # Same key order as a sequential sorted load, whatever order workers finished in
+    all_data = {sensor_id: results[sensor_id] for sensor_id in sorted(results)}
+    
+    changes["removed"] = [entry["sensor_id"] for name, entry in previous.items() if name not in current
+                          and not os.path.exists(os.path.join(data_dir, name))]
+    
+    manifest["files"] = current
+    try:
+        save_manifest(manifest, manifest_path)
+    except OSError as e:
+        print(f"[WARNING] Could not save ingest manifest: {e}")
+    
+    print(f"[INFO] Reused {reused} unchanged files, parsed {len(changes['added']) + len(changes['changed'])}, "
+          f"removed {len(changes['removed'])}")
     print(f"[SUCCESS] Loaded {len(all_data)} sensor files")
+    return all_data, changes
+
+def load_all_sensor_data(data_dir="data", manifest_path=SENSOR_MANIFEST_PATH, workers=None):
+    """Load and analyze all CSV files in the data folder automatically"""
+    all_data, _ = sync_sensor_data(data_dir, manifest_path, workers)
     return all_data
 
-def create_comprehensive_context(all_data):
-    """Create comprehensive context from all sensor data"""
+def create_comprehensive_context(all_data, compact=True):
+    """
+    Create comprehensive context from all sensor data
+    
+    Args:
+        all_data: Output of load_all_sensor_data
+        compact: One table row per sensor with rounded numbers and a table of
+            sample readings, instead of free text and raw sample records
+    """
     total_sensors = len(all_data)
     total_readings = sum(data.get('total_readings', 0) for data in all_data.values() if 'error' not in data)
     
+    if compact:
+        return create_compact_context(all_data, total_sensors, total_readings)
+    
     context_summary = f"""
     BIOSPHERE 2 ENVIRONMENTAL CONTROL SYSTEM ANALYSIS
     
@@ -164,29 +406,66 @@ def create_comprehensive_context(all_data):
     
     return context_summary
 
-def ask_question(question, context_data):
-    """Ask a question about the sensor data using Claude"""
-    prompt = f"""
-    You are a Biosphere 2 environmental analyst. Give short, crisp answers based on the sensor data.
+def create_compact_context(all_data, total_sensors, total_readings):
+    """Tabular form of create_comprehensive_context (see context_builder.format_table)"""
+    sensor_rows = []
+    sample_rows = []
+    for sensor_id, data in sorted(all_data.items()):
+        if 'error' in data:
+            continue
+        
+        stats = data.get('value_stats') or {}
+        start, _, end = str(data.get('time_range', '')).partition(' to ')
+        sensor_rows.append([
+            short_sensor_name(sensor_id),
+            describe_quantity(data.get('sensor_description', '')),
+            format_number(data.get('total_readings', 0)),
+            start[:16] if end else "", end[:16],
+            *(format_number(stats.get(key)) for key in ('min', 'max', 'mean', 'p50'))
+        ])
+        
+        # First 2 records of the first 10 sensors with samples
+        if len(sample_rows) < 20:
+            for record in (data.get('sample_data') or [])[:2]:
+                value = record.get(' VALUE')
+                sample_rows.append([
+                    short_sensor_name(sensor_id),
+                    str(record.get(' TIMESTAMP', '')),
+                    format_number(value) if isinstance(value, (int, float)) else str(value or ""),
+                    str(record.get(' STATUS_TAG') or "").strip("{} ")
+                ])
+    
+    return "\n\n".join([
+        f"BIOSPHERE 2 ENVIRONMENTAL CONTROL SYSTEM: {total_sensors} sensors, {total_readings:,} readings",
+        format_table("SENSOR SUMMARY", ("sensor", "quantity", "readings", "from", "to",
+                                        "min", "max", "mean", "median"), sensor_rows),
+        format_table("SAMPLE DATA FROM KEY SENSORS", ("sensor", "time", "value", "status"), sample_rows)
+    ])
 
-    DATA: {context_data}
+# Fixed instructions, cached ahead of the data summary in every ask_question call
+ASK_INSTRUCTIONS = """You are a Biosphere 2 environmental analyst. Give short, crisp answers based on the sensor data.
 
-    QUESTION: {question}
+RULES:
+- Answer in 1-2 sentences maximum
+- Use specific numbers from the data
+- Be direct and actionable
+- If data is missing, say "No [specific data] available"
+- Focus on what the data shows, not what it doesn't
+"""
 
-    RULES:
-    - Answer in 1-2 sentences maximum
-    - Use specific numbers from the data
-    - Be direct and actionable
-    - If data is missing, say "No [specific data] available"
-    - Focus on what the data shows, not what it doesn't
+def ask_question(question, context_data):
+    """
+    Ask a question about the sensor data using Claude
+    
+    The instructions and the data summary are cached prompt prefixes, so
+    follow-up questions about the same data only send the question uncached.
     """
+    request = build_cached_request("claude-3-haiku-20240307", 200,  # Much shorter responses
+                                   [ASK_INSTRUCTIONS, f"DATA: {context_data}"], f"QUESTION: {question}")
     
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=200,  # Much shorter responses
-            messages=[{"role": "user", "content": prompt}]
-        )
+        response = gateway.create(**request)
+        prompt_cache_stats.record(response.usage, label="ask_question")
         return response.content[0].text
     except Exception as e:
         return f"Error: {str(e)}"
@@ -0,0 +1,130 @@
+# Biosphere 2 Request Coalescing
+# Concurrent identical questions share one retrieval and one Claude call
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from rag_database import normalize_query
+
+
+def question_key(question: str, data_version: Optional[str]) -> tuple:
+    """
+    Flight key: the question as the query-embedding cache keys it, plus the
+    version of the indexed data
+
+    Only case and spacing are folded; signs, decimal points and other
+    punctuation stay, so 'below -5' and 'below 5' never share an answer.
+    """
+    return normalize_query(question), data_version
+
+
+class _Flight:
+    """One in-flight computation and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it runs wait and get the same result (or exception). The
+    key is forgotten as soon as the call finishes, so later callers run it
+    again; reusing finished answers is the answer cache's job.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Run func once for all concurrent callers with this key
+
+        Args:
+            key: e.g. question_key(question, data_hash)
+            func: Zero-argument function computing the result
+
+        Returns:
+            func's result, shared by every caller of the flight
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Flights run, callers that joined one, and flights in progress"""
+        with self._lock:
+            return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': len(self._flights)}
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop
+
+    The leader's coroutine runs as its own task, so a caller that
+    disconnects (and is cancelled) does not cancel the work the others
+    are waiting for.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await func() once for all concurrent callers with this key
+
+        Args:
+            key: e.g. question_key(question, data_hash)
+            func: Zero-argument coroutine function computing the result
+
+        Returns:
+            func's result, shared by every caller of the flight
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Flights run, callers that joined one, and flights in progress"""
+        return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': len(self._flights)}
@@ -1,13 +1,17 @@
 # Spectacular Biosphere 2 RAG Web App with Amazing Colors
 # Ultra-Vibrant Neon Cyberpunk Design
 
-from flask import Flask, render_template_string, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template_string, request, jsonify, send_from_directory
 import json
 import os
 import threading
 import time
-from rag_database import Biosphere2RAGDatabase
-from simple_interface import load_all_sensor_data, create_comprehensive_context
+from rag_database import Biosphere2RAGDatabase, compute_data_hash
+from answer_cache import SemanticAnswerCache
+from prompt_cache import PromptCacheStats, build_cached_request
+from llm_gateway import CircuitBreaker, LLMGateway
+from single_flight import SingleFlight, question_key
+from simple_interface import load_all_sensor_data, create_comprehensive_context, sensor_source_hashes
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
@@ -35,6 +39,58 @@ context_summary = ""
 data_loaded = False
 rag_database = None
 rag_ready = False
+loading_started = False
+loading_lock = threading.Lock()
+
+# Claude model and answer length used by /api/ask and /api/ask/stream
+CLAUDE_MODEL = "claude-3-haiku-20240307"  # Anthropic Claude model (Haiku - available with your API key)
+ANSWER_MAX_TOKENS = 300
+
+# Approximate token budget for retrieved context in the answer prompt. The
+# default matches the old 5000-character cut-off (~1250 tokens); lower it only
+# after checking answer quality (evaluate_retrieval) at the smaller size.
+CONTEXT_TOKEN_BUDGET = int(os.getenv('RAG_CONTEXT_TOKENS', '1250'))
+# Retrieved context as compact tables (1) or as chunk text (0)
+COMPACT_CONTEXT = os.getenv('RAG_COMPACT_CONTEXT', '1') != '0'
+# Send the ~2k-token facility summary as a cached block with every answer (1).
+# Off by default, since it adds input and cache-write tokens to every question.
+# Turn it on only if cache_read_input_tokens in /api/rag-stats show a saving.
+# NOTE: with it off, the only cached block is ANSWER_INSTRUCTIONS (~1.3k tokens),
+# below the 2048-token minimum Haiku caches, so nothing is cached by default;
+# the cache_control marker is then ignored and costs nothing.
+CACHE_FACILITY_SUMMARY = os.getenv('RAG_CACHE_FACILITY_SUMMARY', '0') == '1'
+
+RAG_INITIALIZING_ANSWER = 'RAG system is still initializing. Please wait a moment and try again.'
+NO_RESULTS_ANSWER = "I couldn't find specific information about that in the sensor data. Please try rephrasing your question."
+MISSING_API_KEY_ANSWER = 'Error: ANTHROPIC_API_KEY is not configured. Please set it in your environment variables.'
+
+# Answers reused for near-identical questions about the same indexed data
+answer_cache = SemanticAnswerCache(
+    max_size=int(os.getenv('RAG_ANSWER_CACHE_SIZE', '512')),
+    threshold=float(os.getenv('RAG_ANSWER_CACHE_THRESHOLD', '0.95'))
+)
+
+# Cache hits of the instruction prefix of answer requests
+prompt_cache_stats = PromptCacheStats()
+
+# Claude calls go through a gateway: bounded in-flight calls, a deadline per
+# call, jittered retries on 429/529 and a circuit breaker. While the breaker
+# is open, questions get fallback_answer straight away.
+LLM_GATEWAY_SETTINGS = {
+    'max_in_flight': int(os.getenv('RAG_LLM_CONCURRENCY', '8')),
+    'timeout': float(os.getenv('RAG_LLM_TIMEOUT', '20')),
+    'max_retries': int(os.getenv('RAG_LLM_RETRIES', '2')),
+    'queue_timeout': float(os.getenv('RAG_LLM_QUEUE_TIMEOUT', '5'))
+}
+# Shared with the async app's gateway, so both see the same upstream health
+claude_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('RAG_LLM_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.getenv('RAG_LLM_BREAKER_RESET', '30'))
+)
+claude_gateway = LLMGateway(claude_client, breaker=claude_breaker, **LLM_GATEWAY_SETTINGS) if claude_client else None
+
+# Concurrent /api/ask requests for the same question and data share one answer
+answer_flights = SingleFlight()
 
 # Professional HTML Template
 HTML_TEMPLATE = """<!DOCTYPE html>
@@ -830,6 +886,11 @@ HTML_TEMPLATE = """<!DOCTYPE html>
                 .catch(error => console.log('Stats update failed:', error));
         }
         
+        function finishMessage() {
+            isProcessing = false;
+            document.getElementById('sendButton').disabled = false;
+        }
+        
         function sendMessage() {
             const input = document.getElementById('messageInput');
             const message = input.value.trim();
@@ -842,6 +903,76 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             isProcessing = true;
             document.getElementById('sendButton').disabled = true;
             
+            streamAnswer(message).catch(() => {
+                // Streaming unsupported or failed before any answer text - use the JSON endpoint
+                askWithoutStreaming(message);
+            });
+        }
+        
+        // Read /api/ask/stream: sources arrive first, then answer text token by token
+        async function streamAnswer(message) {
+            const response = await fetch('/api/ask/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ question: message })
+            });
+            if (!response.ok || !response.body) {
+                throw new Error('Streaming unavailable');
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let contentDiv = null;
+            
+            try {
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    
+                    // Events are separated by a blank line
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                        const block = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        
+                        let eventName = 'message';
+                        let payload = '';
+                        block.split('\\n').forEach(line => {
+                            if (line.startsWith('event: ')) eventName = line.slice(7);
+                            else if (line.startsWith('data: ')) payload += line.slice(6);
+                        });
+                        const data = payload ? JSON.parse(payload) : {};
+                        
+                        if (eventName === 'sources') {
+                            hideTypingIndicator();
+                            contentDiv = addMessage('', 'assistant', data.sources);
+                        } else if (eventName === 'token' && contentDiv) {
+                            contentDiv.textContent += data.text;
+                        } else if (eventName === 'error') {
+                            hideTypingIndicator();
+                            if (contentDiv) {
+                                contentDiv.textContent += '\\n\\n' + data.message;
+                            } else {
+                                contentDiv = addMessage(data.message, 'assistant');
+                            }
+                        }
+                    }
+                }
+            } catch (error) {
+                // Before any output the caller falls back to /api/ask
+                if (!contentDiv) throw error;
+                contentDiv.textContent += '\\n\\nConnection lost - the answer may be incomplete.';
+            }
+            
+            if (!contentDiv) {
+                throw new Error('Stream ended before any answer');
+            }
+            finishMessage();
+        }
+        
+        function askWithoutStreaming(message) {
             fetch('/api/ask', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -851,14 +982,12 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             .then(data => {
                 hideTypingIndicator();
                 addMessage(data.answer, 'assistant', data.sources);
-                isProcessing = false;
-                document.getElementById('sendButton').disabled = false;
+                finishMessage();
             })
             .catch(error => {
                 hideTypingIndicator();
                 addMessage('Sorry, I encountered an error. Please try again.', 'assistant');
-                isProcessing = false;
-                document.getElementById('sendButton').disabled = false;
+                finishMessage();
             });
         }
         
@@ -968,6 +1097,8 @@ HTML_TEMPLATE = """<!DOCTYPE html>
                 // Scroll to bottom for user messages
                 container.scrollTop = container.scrollHeight;
             }
+            
+            return contentDiv;
         }
         
         function showTypingIndicator() {
@@ -989,28 +1120,64 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 </html>
 """
 
-def load_data_background():
-    """Load sensor data and initialize RAG database in background"""
+def load_data_background(mmap_index=False, require_saved_index=False):
+    """
+    Load sensor data and initialize RAG database in background
+    
+    Args:
+        mmap_index: Serve the saved FAISS index memory-mapped (see preload_rag)
+        require_saved_index: Stop, leaving nothing loaded, if there is no
+            saved index for the current data instead of building one
+    """
     global sensor_data, context_summary, data_loaded, rag_database, rag_ready
     
     try:
+        print("Initializing RAG database...")
+        rag_database = Biosphere2RAGDatabase(
+            query_cache_size=int(os.getenv('RAG_QUERY_CACHE_SIZE', '256')),
+            query_cache_ttl=float(os.getenv('RAG_QUERY_CACHE_TTL', '3600')),
+            # flat (exact), hnsw or ivfpq; RAG_INDEX_PARAMS is JSON, e.g. {"ef_search": 128}
+            index_backend=os.getenv('RAG_INDEX_BACKEND', 'flat'),
+            index_params=json.loads(os.getenv('RAG_INDEX_PARAMS', '{}')),
+            # float32, float16 or int8 vectors in the embeddings table (new rows only)
+            embedding_storage=os.getenv('RAG_EMBEDDING_STORAGE', 'float32'),
+            # Rollup chunks per sensor: 'daily' (default), 'hourly,daily', or '' for none
+            rollup_periods=tuple(p for p in os.getenv('RAG_ROLLUP_PERIODS', 'daily').split(',') if p)
+        )
+        data_hash = compute_data_hash()
+        
+        # A saved index for the same model and data lets workers skip chunking and embedding
+        if rag_database.load_vector_index(data_hash, mmap=mmap_index):
+            rag_ready = True
+            print("[SUCCESS] RAG database ready (loaded saved index)!")
+        elif require_saved_index:
+            print("[INFO] No saved index for the current data - it will be built after startup")
+            rag_database.close()
+            rag_database = None
+            return
+        
         print("Loading Biosphere 2 sensor data...")
         sensor_data = load_all_sensor_data()
         context_summary = create_comprehensive_context(sensor_data)
         data_loaded = True
         print("[SUCCESS] Sensor data loaded!")
         
-        print("Initializing RAG database...")
-        rag_database = Biosphere2RAGDatabase()
-        
-        print("Creating document chunks...")
-        chunks = rag_database.create_document_chunks(sensor_data)
+        if rag_ready:
+            return
         
-        print("Adding documents to RAG database...")
-        rag_database.add_documents(chunks)
-        
-        print("Building vector index...")
-        rag_database.build_vector_index()
+        # One process at a time rebuilds; the others wait and then load its saved index
+        with rag_database.sync_lock():
+            if not rag_database.load_vector_index(data_hash, mmap=mmap_index):
+                # Start from the last saved index (if any) and re-embed only changed sensors
+                rag_database.load_vector_index()
+                
+                print("Syncing RAG documents with sensor data...")
+                rag_database.sync_documents(sensor_data, sensor_source_hashes(),
+                                            batch_size=int(os.getenv('RAG_EMBED_BATCH_SIZE', '64')))
+                rag_database.save_vector_index(data_hash)
+                if mmap_index:
+                    # Swap the in-memory index for a mapping of the file just saved
+                    rag_database.load_vector_index(data_hash, mmap=True)
         
         rag_ready = True
         print("[SUCCESS] RAG database ready!")
@@ -1019,6 +1186,40 @@ def load_data_background():
         print(f"[ERROR] Failed to initialize RAG system: {e}")
         rag_ready = False
 
+def start_background_loading():
+    """Start load_data_background in a daemon thread, at most once per process"""
+    global loading_started
+    
+    with loading_lock:
+        if loading_started or rag_ready:
+            return
+        loading_started = True
+    threading.Thread(target=load_data_background, daemon=True).start()
+
+def preload_rag():
+    """
+    Load data, model and index before gunicorn forks its workers
+    
+    Runs once in the master (see gunicorn.conf.py). Workers inherit the
+    model and document store copy-on-write and the FAISS vectors as a
+    read-only file mapping, instead of each loading their own copy. The
+    SQLite connection is closed here; workers call init_worker() after fork.
+    
+    Only a saved index for the current data is preloaded. Building one
+    embeds every chunk, and the master accepts no connections meanwhile,
+    so on a cold start nothing is loaded here: the workers start serving
+    at once and load in the background, one building the index under
+    sync_lock while the others wait and then load it.
+    """
+    load_data_background(mmap_index=True, require_saved_index=True)
+    if rag_database:
+        rag_database.close()
+
+def init_worker():
+    """Per-worker setup after fork: reopen SQLite, which must not cross fork()"""
+    if rag_database:
+        rag_database.reconnect()
+
 @app.route('/')
 def index():
     """Main page"""
@@ -1033,12 +1234,22 @@ def get_system_status():
         'sensor_count': len(sensor_data) if sensor_data else 0
     })
 
-@app.route('/api/rag-stats')
-def get_rag_stats():
-    """Get RAG database statistics"""
+def collect_rag_stats():
+    """RAG database, cache and sensor statistics shown in the stats panel"""
+    empty_stats = {
+        'documents': 0,
+        'embeddings': 0,
+        'sensor_types': 0,
+        'total_readings': 0
+    }
     try:
         if rag_database:
             stats = rag_database.get_database_stats()
+            stats['answer_cache'] = answer_cache.stats()
+            stats['prompt_cache'] = prompt_cache_stats.stats()
+            if claude_gateway:
+                stats['llm_gateway'] = claude_gateway.stats()
+            stats['single_flight'] = answer_flights.stats()
             
             # Calculate accurate sensor count and total readings from actual sensor data
             if sensor_data:
@@ -1056,91 +1267,52 @@ def get_rag_stats():
                 stats['sensor_types'] = unique_sensors
                 stats['total_readings'] = total_sensor_readings
             
-            return jsonify(stats)
+            return stats
         else:
-            return jsonify({
-                'documents': 0,
-                'embeddings': 0,
-                'sensor_types': 0,
-                'total_readings': 0
-            })
+            return empty_stats
     except Exception as e:
         print(f"[ERROR] Failed to get RAG stats: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({
-            'documents': 0,
-            'embeddings': 0,
-            'sensor_types': 0,
-            'total_readings': 0
-        })
+        return empty_stats
 
-@app.route('/api/ask', methods=['POST'])
-def ask_question():
-    """Ask a question using RAG system"""
-    try:
-        data = request.get_json()
-        question = data.get('question', '')
-        
-        if not question:
-            return jsonify({'answer': 'Please provide a question.', 'sources': []})
-        
-        if not rag_ready or not rag_database:
-            return jsonify({
-                'answer': 'RAG system is still initializing. Please wait a moment and try again.',
-                'sources': []
-            })
-        
-        # Use RAG system to answer with Claude API
-        # Get RAG context - search more documents for better coverage
-        search_results = rag_database.search(question, top_k=10)
-        sources = search_results
-        
-        # If question is about humidity and initial search didn't find humidity data, do a fallback search
-        question_lower = question.lower()
-        if 'humidity' in question_lower or 'hum' in question_lower:
-            # Check if we found humidity data
-            has_humidity = any('hum' in str(result.get('doc_id', '')).lower() or 
-                              'humidity' in str(result.get('content', '')).lower() 
-                              for result in search_results)
-            
-            if not has_humidity:
-                # Do a fallback search specifically for humidity
-                humidity_search = rag_database.search("humidity sensor data mnthum lowlndhum", top_k=10)
-                if humidity_search:
-                    # Merge results, prioritizing original search but adding humidity results
-                    existing_ids = {r.get('doc_id') for r in search_results}
-                    for result in humidity_search:
-                        if result.get('doc_id') not in existing_ids:
-                            search_results.append(result)
-                            sources.append(result)
-        
-        if search_results:
-            # Build context from search results - increase context length
-            # Rebuild context with updated search results
-            rag_context = rag_database.get_context_for_question(question, max_context_length=5000)
-            
-            # If still no humidity in context for humidity questions, force include humidity summaries
-            if ('humidity' in question_lower or 'hum' in question_lower) and 'hum' not in rag_context.lower():
-                # Get all humidity-related documents directly
-                cursor = rag_database.conn.cursor()
-                cursor.execute('''
-                    SELECT content, metadata FROM documents 
-                    WHERE doc_id LIKE '%hum%' OR content LIKE '%humidity%' OR content LIKE '%mnthum%' OR content LIKE '%lowlndhum%'
-                    LIMIT 5
-                ''')
-                humidity_docs = cursor.fetchall()
-                if humidity_docs:
-                    humidity_text = "\n\n".join([doc[0] for doc in humidity_docs[:3]])
-                    rag_context = humidity_text + "\n\n" + rag_context
-            
-            # Enhanced prompt with RAG context
-            prompt = f"""You're a Biosphere 2 environmental analyst. Give conversational, informative answers using the data provided.
+@app.route('/api/rag-stats')
+def get_rag_stats():
+    """Get RAG database statistics"""
+    return jsonify(collect_rag_stats())
 
-DATA AVAILABLE:
-{rag_context}
+def retrieve_context(question, query_embedding):
+    """
+    Run RAG retrieval for a question
+    
+    One hybrid search: FAISS and BM25 over chunk text and point-name
+    tokens, fused by rank, so questions naming a measurement or a point
+    (humidity, LOWLNDHUM, SATMP) find its sensors without fallback searches.
+    
+    Args:
+        question: User question
+        query_embedding: The question's vector from encode_query
+        
+    Returns:
+        (search_results, sources, rag_context); rag_context is None when
+        nothing relevant was found
+    """
+    # Get RAG context - search more documents for better coverage
+    search_results = rag_database.search(question, top_k=10, query_embedding=query_embedding)
+    sources = search_results
+    
+    if not search_results:
+        return search_results, sources, None
+    
+    # Pack the best of the hits into the token budget, without searching again
+    rag_context = rag_database.get_context_for_question(question, max_context_tokens=CONTEXT_TOKEN_BUDGET,
+                                                        search_results=search_results,
+                                                        compact=COMPACT_CONTEXT)
+    
+    return search_results, sources, rag_context
 
-QUESTION: {question}
+# Fixed analyst instructions: the first cached system block of every answer request
+ANSWER_INSTRUCTIONS = """You're a Biosphere 2 environmental analyst. Give conversational, informative answers using the data provided. Each question comes with the sensor data retrieved for it as DATA AVAILABLE.
 
 CRITICAL RULES:
 1. ALWAYS search the DATA AVAILABLE section for the answer - look for numbers, values, ranges, averages
@@ -1204,34 +1376,104 @@ EXAMPLES OF BAD ANSWERS (DON'T DO THIS):
 
 REMEMBER: The data IS there - search harder, look for sensor names with "hum" or "tmp" in them, find the numbers, and give a natural, informative answer.
 """
+
+def build_answer_request(question, rag_context):
+    """
+    Claude request for a question and its RAG context
+    
+    The instructions are a cached system block, identical on every call;
+    the retrieved context and the question are sent uncached. The
+    instructions alone are below the 2048 tokens Haiku needs to cache a
+    prefix, so by default the request is processed uncached. With
+    RAG_CACHE_FACILITY_SUMMARY=1 the facility summary follows as a second
+    cached block and the prefix becomes long enough to be cached.
+    
+    Returns:
+        Keyword arguments for claude_gateway.create / .stream
+    """
+    facility_summary = None
+    if CACHE_FACILITY_SUMMARY and context_summary:
+        facility_summary = f"FACILITY SUMMARY (all sensors):\n{context_summary}"
+    return build_cached_request(CLAUDE_MODEL, ANSWER_MAX_TOKENS, [ANSWER_INSTRUCTIONS, facility_summary],
+                                f"DATA AVAILABLE:\n{rag_context}\n\nQUESTION: {question}")
+
+def fallback_answer(search_results, error):
+    """Plain answer from the top search result, used when the Claude call fails"""
+    answer = f"Based on the sensor data, I found {len(search_results)} relevant sources. "
+    answer += f"The top result shows: {search_results[0]['content'][:200]}..."
+    answer += f"\n\n(Note: AI enhancement unavailable - {str(error)})"
+    return answer
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def compute_answer(question):
+    """
+    Answer a question with RAG and Claude (the work behind /api/ask)
+    
+    Returns:
+        Response dict with 'answer', 'sources' and, for answer cache hits, 'cached'
+    """
+    # Encode the question once; the search and the context below reuse it
+    query_embedding = rag_database.encode_query(question)
+    
+    # A near-identical question about the same data was answered already
+    cached = answer_cache.get(query_embedding, rag_database.data_hash, question)
+    if cached:
+        return {
+            'answer': cached['answer'],
+            'sources': cached['sources'],
+            'cached': True
+        }
+    
+    search_results, sources, rag_context = retrieve_context(question, query_embedding)
+    
+    if rag_context is not None:
+        try:
+            if not claude_client:
+                return {
+                    'answer': MISSING_API_KEY_ANSWER,
+                    'sources': sources[:3] if sources else []
+                }
             
-            try:
-                if not claude_client:
-                    return jsonify({
-                        'answer': 'Error: ANTHROPIC_API_KEY is not configured. Please set it in your environment variables.',
-                        'sources': sources[:3] if sources else []
-                    })
-                
-                # Get answer from Claude with RAG context
-                response = claude_client.messages.create(
-                    model="claude-3-haiku-20240307",  # Anthropic Claude model (Haiku - available with your API key)
-                    max_tokens=300,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                answer = response.content[0].text
-            except Exception as e:
-                print(f"[ERROR] Claude API call failed: {e}")
-                # Fallback to simple answer
-                answer = f"Based on the sensor data, I found {len(search_results)} relevant sources. "
-                answer += f"The top result shows: {search_results[0]['content'][:200]}..."
-                answer += f"\n\n(Note: AI enhancement unavailable - {str(e)})"
-        else:
-            answer = "I couldn't find specific information about that in the sensor data. Please try rephrasing your question."
+            # Get answer from Claude with RAG context
+            response = claude_gateway.create(**build_answer_request(question, rag_context))
+            prompt_cache_stats.record(response.usage, label="/api/ask")
+            answer = response.content[0].text
+            answer_cache.put(query_embedding, rag_database.data_hash, question,
+                             answer, sources[:3])
+        except Exception as e:
+            print(f"[ERROR] Claude API call failed: {e}")
+            # Fallback to simple answer
+            answer = fallback_answer(search_results, e)
+    else:
+        answer = NO_RESULTS_ANSWER
+
+    return {
+        'answer': answer,
+        'sources': sources[:3] if sources else []
+    }
+
+@app.route('/api/ask', methods=['POST'])
+def ask_question():
+    """Ask a question using RAG system"""
+    try:
+        data = request.get_json()
+        question = data.get('question', '')
         
-        return jsonify({
-            'answer': answer,
-            'sources': sources[:3] if sources else []
-        })
+        if not question:
+            return jsonify({'answer': 'Please provide a question.', 'sources': []})
+        
+        if not rag_ready or not rag_database:
+            return jsonify({
+                'answer': RAG_INITIALIZING_ANSWER,
+                'sources': []
+            })
+        
+        # Identical questions arriving together share one retrieval and Claude call
+        key = question_key(question, rag_database.data_hash)
+        return jsonify(answer_flights.do(key, lambda: compute_answer(question)))
         
     except Exception as e:
         print(f"[ERROR] Question processing failed: {e}")
@@ -1240,6 +1482,87 @@ REMEMBER: The data IS there - search harder, look for sensor names with "hum" or
             'sources': []
         })
 
+@app.route('/api/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """
+    Ask a question using RAG system, streaming the answer as server-sent events
+    
+    Events, in order: 'sources' as soon as retrieval finishes, 'token' for
+    each piece of answer text as it arrives from Claude, then 'done' with
+    the full answer. 'error' replaces 'done' if the request fails.
+    """
+    data = request.get_json(silent=True) or {}
+    question = data.get('question', '')
+    
+    def whole_answer(answer, sources, cached=False):
+        """Events for an answer that is already complete"""
+        yield sse_event('sources', {'sources': sources, 'cached': cached})
+        yield sse_event('token', {'text': answer})
+        yield sse_event('done', {'answer': answer})
+    
+    def generate():
+        try:
+            if not question:
+                yield from whole_answer('Please provide a question.', [])
+                return
+            
+            if not rag_ready or not rag_database:
+                yield from whole_answer(RAG_INITIALIZING_ANSWER, [])
+                return
+            
+            query_embedding = rag_database.encode_query(question)
+            
+            cached = answer_cache.get(query_embedding, rag_database.data_hash, question)
+            if cached:
+                yield from whole_answer(cached['answer'], cached['sources'], cached=True)
+                return
+            
+            search_results, sources, rag_context = retrieve_context(question, query_embedding)
+            sources = sources[:3]
+            
+            if rag_context is None:
+                yield from whole_answer(NO_RESULTS_ANSWER, sources)
+                return
+            
+            if not claude_client:
+                yield from whole_answer(MISSING_API_KEY_ANSWER, sources)
+                return
+            
+            # Sources go out before the LLM call so the client can render them immediately
+            yield sse_event('sources', {'sources': sources, 'cached': False})
+            
+            parts = []
+            try:
+                with claude_gateway.stream(**build_answer_request(question, rag_context)) as stream:
+                    for text in stream.text_stream:
+                        parts.append(text)
+                        yield sse_event('token', {'text': text})
+                    prompt_cache_stats.record(stream.get_final_message().usage, label="/api/ask/stream")
+            except Exception as e:
+                print(f"[ERROR] Claude API streaming failed: {e}")
+                if parts:
+                    yield sse_event('error', {'message': 'The answer was interrupted. Please try again.'})
+                    return
+                answer = fallback_answer(search_results, e)
+                yield sse_event('token', {'text': answer})
+                yield sse_event('done', {'answer': answer})
+                return
+            
+            answer = "".join(parts)
+            answer_cache.put(query_embedding, rag_database.data_hash, question, answer, sources)
+            yield sse_event('done', {'answer': answer})
+            
+        except Exception as e:
+            print(f"[ERROR] Streaming question processing failed: {e}")
+            yield sse_event('error', {
+                'message': 'Sorry, I encountered an error processing your question. Please try again.'
+            })
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop proxies from buffering the stream
+    })
+
 if __name__ == '__main__':
     print("Starting Spectacular Biosphere 2 RAG-Powered Web Interface...")
     print("Loading sensor data and initializing RAG database...")
@@ -1247,7 +1570,7 @@ if __name__ == '__main__':
     print("Amazing neon cyberpunk visual effects loading...")
     
     # Start background data loading
-    threading.Thread(target=load_data_background, daemon=True).start()
+    start_background_loading()
     
     # Start Flask app
     app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,72 @@
+# Biosphere 2 Semantic Answer Cache Tests
+# Hits for equivalent questions, misses for near-duplicates about other entities
+
+import numpy as np
+import pytest
+
+from answer_cache import SemanticAnswerCache, question_signature
+
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def cache_with(question, embedding=(1.0, 0.0, 0.0)):
+    cache = SemanticAnswerCache(max_size=4, threshold=0.95)
+    cache.put(vector(*embedding), "v1", question, f"answer to {question}", [])
+    return cache
+
+
+def test_equivalent_question_hits():
+    cache = cache_with("What is the humidity in the lowland?")
+    hit = cache.get(vector(0.99, 0.05, 0.0), "v1", "what's the humidity in the lowland")
+    assert hit is not None
+    assert hit['answer'] == "answer to What is the humidity in the lowland?"
+    assert cache.stats()['hits'] == 1
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What was the humidity on Sept 25?", "What was the humidity on Sept 26?"),
+    ("What was the humidity on Sept 25?", "What was the humidity on Oct 25?"),
+    ("Is the AHUR5 fan running?", "Is the AHUR6 fan running?"),
+    ("How often was humidity above 80?", "How often was humidity above 85?"),
+    ("How often was it below -5?", "How often was it below 5?"),
+    ("What is the humidity in the lowland?", "What is the humidity in the mountain?"),
+    ("What is the lowland humidity?", "What is the lowland temperature?")
+])
+def test_near_duplicate_with_other_entities_misses(cached, asked):
+    # Embeddings as close as MiniLM puts such pairs; only the entities differ
+    cache = cache_with(cached)
+    assert cache.get(vector(1.0, 0.01, 0.0), "v1", asked) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_miss_below_threshold_and_on_new_data_version():
+    cache = cache_with("What is the CO2 level?")
+    assert cache.get(vector(0.0, 1.0, 0.0), "v1", "What is the CO2 level?") is None
+    assert cache.get(vector(1.0, 0.0, 0.0), "v2", "What is the CO2 level?") is None
+    assert cache.stats()['size'] == 0
+
+
+def test_signature_match_beats_higher_scoring_mismatch():
+    cache = SemanticAnswerCache(max_size=4, threshold=0.9)
+    cache.put(vector(1.0, 0.0, 0.0), "v1", "Humidity on Sept 26?", "26th", [])
+    cache.put(vector(0.95, 0.3, 0.0), "v1", "Humidity on Sept 25?", "25th", [])
+    assert cache.get(vector(1.0, 0.0, 0.0), "v1", "Humidity on Sept 25?")['answer'] == "25th"
+
+
+def test_lru_eviction():
+    cache = SemanticAnswerCache(max_size=2, threshold=0.95)
+    for i, question in enumerate(["fan status", "valve status", "alarm status"]):
+        embedding = np.zeros(3, dtype=np.float32)
+        embedding[i] = 1.0
+        cache.put(embedding, "v1", question, question, [])
+    assert cache.get(vector(1.0, 0.0, 0.0), "v1", "fan status") is None
+    assert cache.get(vector(0.0, 0.0, 1.0), "v1", "alarm status")['answer'] == "alarm status"
+
+
+def test_question_signature():
+    assert question_signature("What's the lowland humidity?") == question_signature("lowland humidity now")
+    assert question_signature("Show me LOWLNDHUM") != question_signature("Show me MNTHUM")
+    assert question_signature("above 5.5") != question_signature("above 5 5")
+    assert question_signature("below -5") != question_signature("below 5")
@@ -0,0 +1,80 @@
+# Biosphere 2 Context Builder Tests
+# Token budgets, duplicate removal and the compact table context
+
+from context_builder import (build_context, build_table_context, compact_text, estimate_tokens,
+                             format_number, format_table, select_chunks)
+
+
+DESCRIPTION = 'Rainforest MiscRF1_LowLndHum - Relative humidity [%]'
+
+
+def result(content, score, **metadata):
+    metadata.setdefault('sensor_type', 'UAB2_BIO1_B4000_MISCRF1_LOWLNDHUM_60764')
+    return {'content': content, 'metadata': metadata, 'similarity_score': score}
+
+
+def test_compact_text_and_estimate_tokens():
+    assert compact_text("  Sensor:   humidity\n\n    Mean:  81.2  \n") == "Sensor: humidity\nMean: 81.2"
+    assert estimate_tokens("a" * 40) == 10
+    assert estimate_tokens("") == 1
+
+
+def test_select_chunks_respects_budget_and_keeps_rank_order():
+    results = [result("x" * 400, 0.9), result("short answer", 0.5), result("y" * 40, 0.4)]
+    selected = select_chunks(results, max_tokens=40)
+    assert sum(chunk['tokens'] for chunk in selected) <= 40
+    # The long chunk does not fit; the others keep their search order
+    assert [chunk['result'] for chunk in selected] == results[1:]
+
+
+def test_select_chunks_drops_near_duplicates():
+    text = "Relative humidity mean 81.2 min 60.1 max 99.0 over 1440 readings"
+    results = [result(text, 0.9), result(text + " ", 0.8, sensor_type='UAB2_BIO1_B4000_MISCRF1_LOWLNDHUM_99999'),
+               result("Fan status on 40% of the time", 0.7)]
+    selected = select_chunks(results, max_tokens=1000)
+    assert [chunk['score'] for chunk in selected] == [0.9, 0.7]
+
+
+def test_select_chunks_prefers_fusion_score():
+    results = [dict(result("a" * 80, 0.9), fusion_score=0.01), dict(result("b" * 80, 0.1), fusion_score=0.03)]
+    assert [chunk['score'] for chunk in select_chunks(results, max_tokens=35)] == [0.03]
+
+
+def test_format_number_and_table():
+    assert format_number(None) == ""
+    assert format_number(12.0) == "12"
+    assert format_number(81.23456) == "81.23"
+    assert format_number(123456.7) == "123457"
+    assert format_table("T", ("a", "b", "c"), [["1", "", "3"], ["4", "", "6"]]) == "T:\na | c\n1 | 3\n4 | 6"
+    assert format_table("T", ("a",), []) == ""
+
+
+def test_table_context_merges_summary_and_statistics():
+    results = [
+        result("summary", 0.9, chunk_type='summary', description=DESCRIPTION, total_readings=1440,
+               time_range="2025-09-25 00:00:00 to 2025-09-26 00:00:00"),
+        result("statistics", 0.8, chunk_type='statistics', value_stats={'min': 60.1, 'max': 99.0, 'mean': 81.234}),
+        result("rollup", 0.6, chunk_type='rollup', period='daily', start_time='2025-09-25 00:00:00',
+               count=1440, min_value=60.1, max_value=99.0, mean_value=81.2)
+    ]
+    context = build_table_context(results, max_tokens=1000)
+    assert context.count("miscrf1_lowlndhum_60764 | Relative humidity [%]") == 1
+    assert ("miscrf1_lowlndhum_60764 | Relative humidity [%] | 1440 | 2025-09-25 00:00 | 2025-09-26 00:00 | "
+            "60.1 | 99 | 81.23") in context
+    assert "Hourly/daily rollups:" in context and "daily | 2025-09-25 00:00 | 1440" in context
+
+
+def test_table_context_drops_second_export_of_a_point():
+    row = dict(chunk_type='summary', description=DESCRIPTION, total_readings=1440,
+               min_value=60.1, max_value=99.0, mean_value=81.2)
+    results = [result("summary", 0.9, **row),
+               result("summary", 0.8, sensor_type='UAB2_BIO1_B4000_MISCRF1_LOWLNDHUM_99999', **row)]
+    context = build_table_context(results, max_tokens=1000)
+    assert "_60764" in context and "_99999" not in context
+
+
+def test_build_context_modes():
+    results = [result("Lowland humidity averaged 81%", 0.9, chunk_type='summary')]
+    assert build_context(results, 100) == "[UAB2_BIO1_B4000_MISCRF1_LOWLNDHUM_60764] Lowland humidity averaged 81%"
+    assert build_context(results, 100, compact=True).startswith("Sensor statistics:")
+    assert build_context(results, 1) == ""
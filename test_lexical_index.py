@@ -0,0 +1,60 @@
+# Biosphere 2 Lexical Index Tests
+# BM25 ranking over point names and reciprocal rank fusion ordering
+
+import numpy as np
+import pytest
+
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    (10, "MISCRF1_LOWLNDHUM relative humidity in the lowland rainforest"),
+    (20, "MISCRF1_MNTHUM relative humidity on the mountain"),
+    (30, "RFTESCOVFDOUT fan output command, fan on or off"),
+    (40, "RFTESCOSUPTMP supply air temperature")
+]
+
+
+@pytest.fixture
+def index():
+    bm25 = BM25Index()
+    bm25.build(DOCUMENTS)
+    return bm25
+
+
+def test_tokenize_drops_stopwords_and_splits_point_names():
+    assert tokenize("What is the LowLndHum of MISCRF1_LOWLNDHUM?") == ["lowlndhum", "miscrf1", "lowlndhum"]
+
+
+def test_point_name_matches_exactly(index):
+    hits = index.search("Show me LOWLNDHUM", top_k=5)
+    assert [doc_id for doc_id, _ in hits] == [10]
+
+
+def test_rarer_and_repeated_terms_rank_higher(index):
+    hits = index.search("fan humidity", top_k=5)
+    # 'fan' occurs twice in one document, 'humidity' once in two: fan wins
+    assert hits[0][0] == 30
+    assert {doc_id for doc_id, _ in hits[1:]} == {10, 20}
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_top_k_allowed_ids_and_no_match(index):
+    assert len(index.search("humidity fan temperature", top_k=2)) == 2
+    assert [doc_id for doc_id, _ in index.search("humidity", allowed_ids=np.array([20, 30]))] == [20]
+    assert index.search("what is the", top_k=5) == []
+    assert index.search("co2", top_k=5) == []
+    assert BM25Index().search("humidity") == []
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 2, 4]], k=60)
+    # Ids in both lists beat the top hit of either; ranks (3, 1) edge out (2, 2)
+    assert list(fused) == [3, 2, 1, 4]
+    assert fused[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[2] == pytest.approx(2 / 62)
+
+
+def test_rrf_ranks_single_list_hits_by_position():
+    fused = reciprocal_rank_fusion([[7, 8], [9]], k=1)
+    assert list(fused) == [7, 9, 8]
+    assert fused[7] == fused[9] == pytest.approx(0.5)
@@ -0,0 +1,145 @@
+# Biosphere 2 LLM Gateway Tests
+# Circuit breaker transitions, retries, deadlines and bounded in-flight calls
+
+import threading
+import time
+
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+
+class StatusError(Exception):
+    """Stands in for an Anthropic APIStatusError"""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+class FakeMessages:
+    """messages.create that replays outcomes and records concurrency"""
+
+    def __init__(self, outcomes=(), delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def create(self, timeout=None, **request):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            outcome = self.outcomes.pop(0) if self.outcomes else "answer"
+        try:
+            time.sleep(self.delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FakeClient:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def with_options(self, **options):
+        return self
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "BACKOFF_BASE", 0.001)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()       # the one trial call
+    assert not breaker.allow()   # everyone else waits for it
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+
+
+def test_retries_overload_then_succeeds():
+    messages = FakeMessages([StatusError(529), StatusError(429), "ok"])
+    gateway = LLMGateway(FakeClient(messages), max_retries=2, timeout=5)
+    assert gateway.create(model="m") == "ok"
+    assert messages.calls == 3
+    assert gateway.stats()['retries'] == 2
+    assert gateway.stats()['failures'] == 0
+
+
+def test_client_error_is_not_retried_or_counted_as_failure():
+    messages = FakeMessages([StatusError(400)])
+    gateway = LLMGateway(FakeClient(messages), timeout=5)
+    with pytest.raises(StatusError):
+        gateway.create(model="m")
+    assert messages.calls == 1
+    assert gateway.stats()['failures'] == 0
+    assert gateway.breaker.state == "closed"
+
+
+def test_open_breaker_rejects_without_calling():
+    messages = FakeMessages([StatusError(500)])
+    gateway = LLMGateway(FakeClient(messages), timeout=5,
+                         breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    with pytest.raises(StatusError):
+        gateway.create(model="m")
+    with pytest.raises(LLMUnavailableError):
+        gateway.create(model="m")
+    assert messages.calls == 1
+    assert gateway.stats()['rejected_open'] == 1
+
+
+def test_deadline_bounds_slow_call_and_counts_failure():
+    gateway = LLMGateway(FakeClient(FakeMessages(delay=0.5)), timeout=0.05)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        gateway.create(model="m")
+    assert time.monotonic() - start < 0.3
+    assert gateway.stats()['failures'] == 1
+
+
+def test_in_flight_stays_bounded_after_timeouts():
+    messages = FakeMessages(delay=0.3)
+    gateway = LLMGateway(FakeClient(messages), max_in_flight=2, timeout=0.05, queue_timeout=0.01,
+                         breaker=CircuitBreaker(failure_threshold=100))
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            gateway.create(model="m")
+
+    # Both timed-out requests are still running upstream and keep their slots
+    assert gateway.stats()['in_flight'] == 2
+    with pytest.raises(LLMUnavailableError, match="slots busy"):
+        gateway.create(model="m")
+    assert messages.max_active <= 2
+
+    time.sleep(0.4)
+    assert gateway.stats()['in_flight'] == 0
+    messages.delay = 0.0
+    assert gateway.create(model="m") == "answer"
+    assert messages.max_active <= 2
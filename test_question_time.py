@@ -0,0 +1,44 @@
+# Biosphere 2 Question Time Parsing Tests
+# Dates, spans and months named in questions, and time intent
+
+from datetime import datetime
+
+import pytest
+
+from question_time import has_time_intent, question_dates, question_time_range
+
+
+@pytest.mark.parametrize("question, start, end", [
+    ("Humidity on 2025-10-05?", datetime(2025, 10, 5), datetime(2025, 10, 6)),
+    ("Humidity on 10/5?", datetime(2025, 10, 5), datetime(2025, 10, 6)),
+    ("Humidity on 10/5/24?", datetime(2024, 10, 5), datetime(2024, 10, 6)),
+    ("What happened on Oct 5th?", datetime(2025, 10, 5), datetime(2025, 10, 6)),
+    ("What happened on the 5th of October 2024?", datetime(2024, 10, 5), datetime(2024, 10, 6)),
+    ("Fan runtime September 21-28", datetime(2025, 9, 21), datetime(2025, 9, 29)),
+    ("Average temperature in December", datetime(2025, 12, 1), datetime(2026, 1, 1))
+])
+def test_question_dates(question, start, end):
+    assert question_dates(question, 2025) == [(start, end)]
+
+
+def test_time_range_covers_every_date():
+    assert question_time_range("Compare Sept 25 with Oct 2", 2025) == (datetime(2025, 9, 25), datetime(2025, 10, 3))
+    assert question_time_range("What is the lowland humidity?", 2025) is None
+
+
+def test_invalid_dates_and_plain_numbers_are_ignored():
+    assert question_dates("Humidity on February 30", 2025) == []
+    assert question_dates("How often was humidity above 85?", 2025) == []
+    # 'may' as a verb is not a month without a day after it
+    assert question_dates("Why may the fan be off?", 2025) == []
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What was the humidity overnight?", True),
+    ("Hourly temperature yesterday", True),
+    ("What happened on Oct 5?", True),
+    ("What is the average lowland humidity?", False),
+    ("Is the supply fan running?", False)
+])
+def test_has_time_intent(question, expected):
+    assert has_time_intent(question) is expected
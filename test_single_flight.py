@@ -0,0 +1,84 @@
+# Biosphere 2 Request Coalescing Tests
+# Flight keys, shared results and errors for threads and coroutines
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight, question_key
+
+
+def test_question_key_folds_case_and_spacing_only():
+    assert question_key("What is  the Lowland humidity", "v1") == question_key("what is the lowland humidity", "v1")
+    assert question_key("What is the humidity", "v1") != question_key("What is the humidity", "v2")
+
+
+@pytest.mark.parametrize("first, second", [
+    ("How often was it below -5?", "How often was it below 5?"),
+    ("Humidity above 5.5", "Humidity above 5 5"),
+    ("Temperature at 12:30", "Temperature at 12 30")
+])
+def test_question_key_keeps_signs_and_decimals(first, second):
+    assert question_key(first, "v1") != question_key(second, "v1")
+
+
+def test_concurrent_callers_share_one_call():
+    group = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(1)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("k", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while group.stats()['leaders'] + group.stats()['shared'] < 5:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert group.stats() == {'leaders': 1, 'shared': 4, 'in_flight': 0}
+
+
+def test_error_propagates_and_key_is_forgotten():
+    group = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        group.do("k", fail)
+    # A finished flight is not reused
+    assert group.do("k", lambda: "retry") == "retry"
+    assert group.stats()['leaders'] == 2
+
+
+def test_async_flight_survives_cancelled_caller():
+    async def scenario():
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.ensure_future(group.do("k", work))
+        second = asyncio.ensure_future(group.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "answer"
+        return calls, group.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert stats == {'leaders': 1, 'shared': 1, 'in_flight': 0}
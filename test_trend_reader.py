@@ -0,0 +1,57 @@
+# Biosphere 2 Trend Reader Tests
+# Parsing BACnet trend exports with malformed rows
+
+import pytest
+
+import simple_interface
+from trend_reader import format_time_range, read_trend_csv
+
+HEADER = (
+    "units=u:percent;%;(%);|precision=i:1\n"
+    "Rainforest MiscRF1_LowLndHum - Relative humidity [%]\n"
+    "ID, TIMESTAMP, TRENDFLAGS, STATUS, VALUE, TRENDFLAGS_TAG, STATUS_TAG\n"
+)
+
+
+def write_trend(tmp_path, rows):
+    path = tmp_path / "UAB2_BIO1_B4000_MISCRF1_LOWLNDHUM_60764.csv"
+    path.write_text(HEADER + "".join(f"{row}\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_tag_sets_with_commas_stay_in_one_field(tmp_path):
+    df = read_trend_csv(write_trend(tmp_path, [
+        "1, 2025/10/01 00:00:00, 0, 128, 85.5, { }, {alarm,unackedAlarm}",
+        "2, 2025/10/01 00:15:00, 0, 0, 86.0, { }, {ok}"
+    ]))
+    assert len(df) == 2
+    assert df['STATUS_TAG'].tolist() == ["{alarm,unackedAlarm}", "{ok}"]
+    assert df['VALUE'].tolist() == [85.5, 86.0]
+
+
+def test_time_range_skips_unparseable_edge_rows(tmp_path):
+    df = read_trend_csv(write_trend(tmp_path, [
+        "1, not a time, 0, 0, 80.0, { }, {ok}",
+        "2, 2025/10/01 00:00:00, 0, 0, 81.0, { }, {ok}",
+        "3, 2025/10/02 12:30:00, 0, 0, 82.0, { }, {ok}",
+        "4, 2025/13/45 99:99:99, 0, 0, 83.0, { }, {ok}"
+    ]))
+    assert len(df) == 4
+    assert format_time_range(df['TIMESTAMP']) == "2025/10/01 00:00:00 to 2025/10/02 12:30:00"
+
+
+def test_time_range_without_valid_timestamps(tmp_path):
+    df = read_trend_csv(write_trend(tmp_path, ["1, garbage, 0, 0, 80.0, { }, {ok}"]))
+    assert format_time_range(df['TIMESTAMP']) == "No data"
+
+
+def test_load_sensor_file_keeps_file_with_malformed_edge_row(tmp_path, monkeypatch):
+    monkeypatch.setattr(simple_interface, "load_trend_frame", read_trend_csv)
+    stats = simple_interface.load_sensor_file(write_trend(tmp_path, [
+        "1, 2025/10/01 00:00:00, 0, 0, 81.0, { }, {ok}",
+        "2, 2025/10/01 00:15:00, 0, 0, 83.0, { }, {ok}",
+        "3, 2025/10/01 00:3, 0, 0, 82.0, { }, {ok}"
+    ]))
+    assert stats['total_readings'] == 3
+    assert stats['time_range'] == "2025/10/01 00:00:00 to 2025/10/01 00:15:00"
+    assert stats['value_stats']['max'] == pytest.approx(83.0)
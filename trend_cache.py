@@ -0,0 +1,156 @@
+# Biosphere 2 Columnar Trend Cache
+# Typed Arrow copies of the raw trend CSVs, partitioned by sensor point name
+
+import json
+import os
+import re
+import glob
+import pandas as pd
+from typing import Optional
+
+from trend_reader import read_trend_csv
+
+# Arrow is optional - without it every load parses the CSV directly
+try:
+    import pyarrow as pa
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+TREND_CACHE_DIR = os.path.join("cache", "trends")
+CACHE_FORMAT_VERSION = "1"
+_METADATA_KEY = b"biosphere2_trend"
+
+# Trailing export id on trend file names, e.g. ..._MNTTMP_57287.csv
+_EXPORT_ID = re.compile(r"_(\d+)$")
+
+
+def point_name(csv_path: str) -> str:
+    """Return the sensor point name for a trend file (file stem minus export id)"""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return _EXPORT_ID.sub("", stem)
+
+
+def cache_path(csv_path: str, cache_dir: str = TREND_CACHE_DIR) -> str:
+    """Return the cache file path: <cache_dir>/point=<POINT>/<file stem>.arrow"""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"point={point_name(csv_path)}", f"{stem}.arrow")
+
+
+def _source_signature(csv_path: str) -> dict:
+    """Size and mtime of the source CSV, used to detect stale cache files"""
+    file_stat = os.stat(csv_path)
+    return {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+
+
+def write_trend_cache(df: pd.DataFrame, csv_path: str, cache_dir: str = TREND_CACHE_DIR) -> str:
+    """
+    Write a typed trend frame to an uncompressed Arrow IPC file
+
+    Uncompressed IPC files can be memory-mapped on read, so numeric
+    columns are served straight from the page cache.
+
+    Returns:
+        Path of the written cache file
+    """
+    path = cache_path(csv_path, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    header = {
+        "version": CACHE_FORMAT_VERSION,
+        "source": _source_signature(csv_path),
+        "attrs": df.attrs
+    }
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _METADATA_KEY: json.dumps(header).encode("utf-8")
+    })
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_trend_cache(csv_path: str, cache_dir: str = TREND_CACHE_DIR) -> Optional[pd.DataFrame]:
+    """
+    Read a cached trend frame if it exists and matches the source CSV
+
+    Returns:
+        The typed DataFrame, or None if the cache is missing or stale
+    """
+    path = cache_path(csv_path, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            header = json.loads((reader.schema.metadata or {}).get(_METADATA_KEY, b"{}"))
+            if (header.get("version") != CACHE_FORMAT_VERSION
+                    or header.get("source") != _source_signature(csv_path)):
+                return None
+            df = reader.read_all().to_pandas(split_blocks=True, self_destruct=True)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"[WARNING] Ignoring unreadable trend cache {path}: {e}")
+        return None
+
+    df.attrs.update(header.get("attrs", {}))
+    return df
+
+
+def load_trend_frame(csv_path: str, cache_dir: str = TREND_CACHE_DIR) -> pd.DataFrame:
+    """
+    Load a trend export as a typed DataFrame, via the columnar cache
+
+    Reads the memory-mapped Arrow copy when it is current; otherwise parses
+    the CSV with read_trend_csv and refreshes the cache.
+
+    Raises:
+        TrendFormatError: If the CSV is not a trend export
+    """
+    if HAS_ARROW:
+        df = read_trend_cache(csv_path, cache_dir)
+        if df is not None:
+            return df
+
+    df = read_trend_csv(csv_path)
+
+    if HAS_ARROW:
+        try:
+            write_trend_cache(df, csv_path, cache_dir)
+        except (OSError, pa.ArrowException) as e:
+            print(f"[WARNING] Could not write trend cache for {csv_path}: {e}")
+    return df
+
+
+def build_trend_cache(data_dir: str = "data", cache_dir: str = TREND_CACHE_DIR) -> int:
+    """
+    Convert every trend CSV in data_dir into the columnar cache
+
+    Returns:
+        Number of files written or refreshed
+    """
+    if not HAS_ARROW:
+        print("[ERROR] Install pyarrow to build the trend cache: pip install pyarrow")
+        return 0
+
+    written = 0
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        if read_trend_cache(csv_path, cache_dir) is not None:
+            continue
+        try:
+            write_trend_cache(read_trend_csv(csv_path), csv_path, cache_dir)
+            written += 1
+        except ValueError as e:
+            print(f"[WARNING] Skipping {csv_path}: {e}")
+    return written
+
+
+if __name__ == "__main__":
+    print("[CACHE] Converting trend CSVs to the columnar cache...")
+    count = build_trend_cache()
+    print(f"[SUCCESS] {count} trend files cached in {TREND_CACHE_DIR}")
@@ -0,0 +1,175 @@
+# Biosphere 2 BACnet Trend CSV Reader
+# Fast typed parser for the trend export layout used by every file in data/
+
+import io
+import pandas as pd
+from typing import List, Tuple
+
+# Layout of a trend export:
+#   line 1: point metadata (units=..., trueText=..., etc.)
+#   line 2: point description ("Rainforest MiscRF1_MntTmp - Temperature [°F]")
+#   line 3: column header
+#   line 4+: ID, TIMESTAMP, TRENDFLAGS, STATUS, VALUE, TRENDFLAGS_TAG, STATUS_TAG
+TREND_COLUMNS = ['ID', 'TIMESTAMP', 'TRENDFLAGS', 'STATUS', 'VALUE', 'TRENDFLAGS_TAG', 'STATUS_TAG']
+TIMESTAMP_FORMAT = '%Y/%m/%d %H:%M:%S'
+HEADER_LINES = 3
+
+TREND_DTYPES = {
+    'ID': 'int64',
+    'TIMESTAMP': str,
+    'TRENDFLAGS': 'int32',
+    'STATUS': 'int32',
+    'VALUE': 'float64',
+    'TRENDFLAGS_TAG': 'category',
+    'STATUS_TAG': 'category'
+}
+
+
+class TrendFormatError(ValueError):
+    """Raised when a CSV file does not follow the BACnet trend export layout"""
+
+
+def _split_header(raw: bytes) -> Tuple[bytes, bytes]:
+    """Split raw file bytes into the header lines and the data rows"""
+    position = 0
+    for _ in range(HEADER_LINES):
+        position = raw.find(b'\n', position) + 1
+        if position == 0:
+            raise TrendFormatError("File is shorter than the trend header")
+    return raw[:position], raw[position:]
+
+
+def _detect_header_encoding(header: bytes) -> str:
+    """Return 'utf-8' if the header bytes decode as UTF-8, otherwise 'latin-1'"""
+    try:
+        header.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def detect_encoding(file_path: str) -> str:
+    """
+    Detect the text encoding of a trend export from its header lines
+
+    Data rows are plain ASCII; only the description line may contain
+    non-ASCII characters such as the degree sign, written as Latin-1.
+
+    Args:
+        file_path: Path to the CSV file
+
+    Returns:
+        'utf-8' if the header decodes as UTF-8, otherwise 'latin-1'
+    """
+    with open(file_path, 'rb') as f:
+        header = b''.join(f.readline() for _ in range(HEADER_LINES))
+    return _detect_header_encoding(header)
+
+
+def parse_trend_header(header: bytes, encoding: str) -> Tuple[str, str, List[str]]:
+    """
+    Parse the metadata line, description line and raw column names
+
+    Returns:
+        (metadata, description, raw_columns) where raw_columns keep the
+        original spacing, e.g. ' TIMESTAMP'
+
+    Raises:
+        TrendFormatError: If the column header is not the trend layout
+    """
+    lines = header.decode(encoding).splitlines()
+    metadata, description = lines[0].strip(), lines[1].strip()
+    raw_columns = lines[2].split(',')
+
+    if [column.strip() for column in raw_columns] != TREND_COLUMNS:
+        raise TrendFormatError(f"Unexpected trend header: {lines[2]!r}")
+
+    return metadata, description, raw_columns
+
+
+def read_trend_csv(file_path: str) -> pd.DataFrame:
+    """
+    Read a BACnet trend export into a typed DataFrame
+
+    The file is read once; the encoding is detected from the header bytes
+    and the rows are parsed by the pandas C engine with explicit dtypes.
+    TIMESTAMP is parsed to datetime64 and the tag columns are categoricals.
+    Column names are stripped; header details are kept in ``df.attrs``
+    ('metadata', 'description', 'raw_columns', 'encoding').
+
+    Args:
+        file_path: Path to the CSV file
+
+    Returns:
+        DataFrame with columns TREND_COLUMNS
+
+    Raises:
+        TrendFormatError: If the header is not the trend export layout
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+
+    header, body = _split_header(raw)
+    encoding = _detect_header_encoding(header)
+    metadata, description, raw_columns = parse_trend_header(header, encoding)
+
+    # Tag sets like {alarm,unackedAlarm} are unquoted and contain commas.
+    # Turning the braces into quotes lets the C engine keep each set in one field.
+    body = body.replace(b'{', b'"').replace(b'}', b'"')
+
+    read_options = dict(
+        header=None,
+        names=TREND_COLUMNS,
+        encoding=encoding,
+        engine='c',
+        skipinitialspace=True,
+        on_bad_lines='skip'
+    )
+    try:
+        df = pd.read_csv(io.BytesIO(body), dtype=TREND_DTYPES, **read_options)
+    except ValueError:
+        # A non-numeric VALUE (e.g. an enum point) - read it as text and coerce
+        df = pd.read_csv(io.BytesIO(body), dtype={**TREND_DTYPES, 'VALUE': str}, **read_options)
+        df['VALUE'] = pd.to_numeric(df['VALUE'], errors='coerce')
+
+    df['TIMESTAMP'] = pd.to_datetime(df['TIMESTAMP'], format=TIMESTAMP_FORMAT, errors='coerce')
+
+    # Restore the original brace notation on the (few) category labels
+    for column in ('TRENDFLAGS_TAG', 'STATUS_TAG'):
+        df[column] = df[column].cat.rename_categories(lambda tag: '{' + tag + '}')
+
+    df.attrs.update({
+        'metadata': metadata,
+        'description': description,
+        'raw_columns': raw_columns,
+        'encoding': encoding
+    })
+    return df
+
+
+def format_time_range(timestamps: pd.Series) -> str:
+    """
+    'first to last' reading time, skipping unparseable (NaT) timestamps
+
+    Returns:
+        e.g. '2025/10/01 00:00:00 to 2025/10/22 01:45:00', or 'No data'
+        if no timestamp could be parsed
+    """
+    valid = timestamps.dropna()
+    if valid.empty:
+        return "No data"
+    return f"{valid.iloc[0]:{TIMESTAMP_FORMAT}} to {valid.iloc[-1]:{TIMESTAMP_FORMAT}}"
+
+
+def sample_records(df: pd.DataFrame, count: int = 5) -> List[dict]:
+    """
+    Return the first rows of a trend frame as plain records
+
+    Keys use the file's raw column names (' TIMESTAMP', ' VALUE', ...) and
+    timestamps are formatted as in the source file, matching the records
+    the earlier pandas loaders produced.
+    """
+    head = df.head(count)
+    columns = [head[column].tolist() for column in TREND_COLUMNS]
+    columns[TREND_COLUMNS.index('TIMESTAMP')] = head['TIMESTAMP'].dt.strftime(TIMESTAMP_FORMAT).tolist()
+    return [dict(zip(df.attrs['raw_columns'], row)) for row in zip(*columns)]
@@ -0,0 +1,151 @@
+# Biosphere 2 Vector Index Backends
+# Flat, HNSW and IVF-PQ FAISS indexes with persisted build parameters
+
+import math
+import numpy as np
+from typing import Any, Dict, Optional
+
+import faiss
+
+# Build parameters change the index structure and are persisted with it;
+# query parameters (ef_search, nprobe, k_factor) trade recall for speed per search.
+# IVF-PQ recall is bounded by the PQ codes, not nprobe: on 384-d clustered chunks
+# (benchmark_vector_index) m=48 found 0.24 of the exact top 10 at 10k chunks and
+# 0.21 at 100k for any nprobe; m=96 alone 0.48 / 0.46. Re-ranking the top
+# k * k_factor exactly against the stored vectors lifts m=96 to 0.87 / 0.84
+# (k_factor 4) and 0.99 / 0.98 (k_factor 10).
+BACKEND_PARAMS = {
+    "flat": {
+        "build": {},
+        "query": {}
+    },
+    "hnsw": {
+        "build": {"M": 32, "ef_construction": 200},
+        "query": {"ef_search": 64}
+    },
+    "ivfpq": {
+        "build": {"nlist": None, "m": 96, "nbits": 8},  # nlist None: about 4 * sqrt(n)
+        "query": {"nprobe": 16, "k_factor": 10}
+    }
+}
+
+INDEX_BACKENDS = tuple(BACKEND_PARAMS)
+
+
+def resolve_params(backend: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Default build and query parameters for a backend, updated with overrides
+
+    Args:
+        backend: One of INDEX_BACKENDS
+        overrides: Flat {name: value} dict, e.g. {'ef_search': 128}
+
+    Returns:
+        Flat {name: value} dict with every parameter of the backend
+    """
+    if backend not in BACKEND_PARAMS:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {INDEX_BACKENDS}")
+    params = {**BACKEND_PARAMS[backend]["build"], **BACKEND_PARAMS[backend]["query"]}
+    unknown = set(overrides or {}) - set(params)
+    if unknown:
+        raise ValueError(f"Unknown parameters for '{backend}' index: {sorted(unknown)}")
+    params.update(overrides or {})
+    return params
+
+
+def build_params(backend: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """The structural subset of params that a saved index must match"""
+    return {name: params[name] for name in BACKEND_PARAMS[backend]["build"]}
+
+
+def supports_remove(backend: str) -> bool:
+    """HNSW graphs cannot drop vectors; such indexes are rebuilt on change instead"""
+    return backend != "hnsw"
+
+
+def rerank_factor(backend: str, params: Dict[str, Any]) -> int:
+    """Candidates fetched per result for an exact re-rank (1: scores are already exact)"""
+    return params.get("k_factor", 1) if backend == "ivfpq" else 1
+
+
+def exact_rerank(query: np.ndarray, ids: np.ndarray, vectors: np.ndarray, k: int):
+    """
+    Re-score approximate candidates by inner product with their full vectors
+
+    Args:
+        query: Unit query vector of shape (dimension,)
+        ids: Candidate ids, one per row of vectors
+        vectors: Unit float32 vectors of the candidates
+        k: Results to keep
+
+    Returns:
+        (scores, ids) of the best k candidates, best first
+    """
+    scores = vectors @ query
+    order = np.argsort(-scores, kind="stable")[:k]
+    return scores[order], ids[order]
+
+
+def ivf_list_count(n_vectors: int, nlist: Optional[int] = None) -> int:
+    """Number of IVF lists: nlist, or about 4 * sqrt(n) with ~39 training points per list"""
+    if nlist:
+        return nlist
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def create_index(backend: str, vectors: np.ndarray, ids: np.ndarray,
+                 params: Dict[str, Any]) -> faiss.Index:
+    """
+    Train (if needed) and fill an inner-product index
+
+    Vectors must be L2-normalized; ids are embeddings-table row ids. Every
+    backend supports add_with_ids, reconstruct and IDSelector filtering.
+
+    Args:
+        backend: One of INDEX_BACKENDS
+        vectors: float32 array of shape (n, dimension)
+        ids: int64 ids, one per vector
+        params: Output of resolve_params
+
+    Returns:
+        The FAISS index
+    """
+    dimension = vectors.shape[1]
+
+    if backend == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    elif backend == "hnsw":
+        graph = faiss.IndexHNSWFlat(dimension, params["M"], faiss.METRIC_INNER_PRODUCT)
+        graph.hnsw.efConstruction = params["ef_construction"]
+        index = faiss.IndexIDMap2(graph)
+    elif backend == "ivfpq":
+        if dimension % params["m"]:
+            raise ValueError(f"IVF-PQ m={params['m']} must divide the dimension {dimension}")
+        if len(vectors) < 2 ** params["nbits"]:
+            raise ValueError(f"IVF-PQ needs at least {2 ** params['nbits']} vectors to train, got {len(vectors)}")
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, ivf_list_count(len(vectors), params["nlist"]),
+                                 params["m"], params["nbits"], faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        # Id -> list lookups for reconstruct and remove_ids
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {INDEX_BACKENDS}")
+
+    index.add_with_ids(vectors, ids)
+    return index
+
+
+def search_parameters(backend: str, params: Dict[str, Any],
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query FAISS parameters: the recall/speed knob and an optional id filter
+
+    Passing these per call, rather than setting them on the index, keeps
+    concurrent searches with different settings thread-safe.
+    """
+    if backend == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params["ef_search"])
+    if backend == "ivfpq":
+        return faiss.SearchParametersIVF(sel=selector, nprobe=params["nprobe"])
+    return faiss.SearchParameters(sel=selector) if selector is not None else None